@@ -0,0 +1,186 @@
+import os
+from urllib.parse import urlparse
+
+try:
+  import psutil
+except ImportError:
+  psutil = None
+
+# BROWSER_PROFILE=debug 時顯示瀏覽器視窗並載入完整資源，方便除錯
+PROFILE = os.environ.get("BROWSER_PROFILE", "production")
+
+BLOCKED_RESOURCE_TYPES = {'image', 'font', 'media'}
+BLOCKED_EXTENSIONS = ['png', 'jpg', 'jpeg', 'gif', 'webp', 'svg', 'ico', 'woff', 'woff2', 'ttf', 'otf', 'mp4', 'webm', 'mp3']
+TRACKER_DOMAINS = [
+  'google-analytics.com',
+  'googletagmanager.com',
+  'doubleclick.net',
+  'googlesyndication.com',
+  'facebook.net',
+  'connect.facebook.com',
+  'hotjar.com',
+  'segment.io',
+  'segment.com',
+  'intercom.io',
+  'fullstory.com',
+  'mixpanel.com',
+  'clarity.ms',
+  'criteo.com',
+]
+
+CHROMIUM_ARGS = [
+  '--disable-gpu',
+  '--disable-extensions',
+  '--disable-dev-shm-usage',
+  '--disable-background-networking',
+  '--mute-audio',
+  '--no-first-run',
+]
+
+def is_production():
+  return PROFILE != 'debug'
+
+def is_tracker(url):
+  host = urlparse(url).hostname or ''
+  return any(host == domain or host.endswith('.' + domain) for domain in TRACKER_DOMAINS)
+
+# --- Selenium ---
+
+def apply_edge_profile(edge_options):
+  """
+  在 EdgeOptions 上套用正式環境設定：無頭模式、關閉 GPU 與圖片。
+  """
+  if not is_production():
+    return edge_options
+  edge_options.add_argument("--headless=new")
+  for arg in CHROMIUM_ARGS:
+    edge_options.add_argument(arg)
+  edge_options.add_argument("--blink-settings=imagesEnabled=false")
+  edge_options.add_experimental_option("prefs", {
+    "profile.managed_default_content_settings.images": 2
+  })
+  return edge_options
+
+def block_driver_requests(driver):
+  """
+  透過 CDP 擋掉字型、媒體與追蹤器的請求，需在第一次 driver.get 前呼叫。
+  """
+  if not is_production():
+    return
+  patterns = [f"*.{extension}*" for extension in BLOCKED_EXTENSIONS]
+  patterns += [f"*{domain}*" for domain in TRACKER_DOMAINS]
+  try:
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+  except Exception as e:
+    print(f"無法設定請求攔截：{e}")
+
+# --- Playwright ---
+
+def launch_chromium(playwright, headless=None):
+  if headless is None:
+    headless = is_production()
+  args = CHROMIUM_ARGS if is_production() else []
+  return playwright.chromium.launch(headless=headless, args=args)
+
+def block_route(route):
+  request = route.request
+  if request.resource_type in BLOCKED_RESOURCE_TYPES or is_tracker(request.url):
+    route.abort()
+  else:
+    route.continue_()
+
+def block_page_requests(target):
+  """
+  在 Playwright 的 BrowserContext 或 Page 上攔截圖片、字型、媒體與追蹤器請求。
+  """
+  if is_production():
+    target.route("**/*", block_route)
+
+# --- 資源用量 ---
+
+def process_tree_usage(pid):
+  """
+  回傳 pid 及其所有子程序的 (RSS MB, CPU 秒數)，沒有 psutil 時回傳 None。
+  """
+  if psutil is None:
+    return None
+  try:
+    root = psutil.Process(pid)
+    processes = [root] + root.children(recursive=True)
+  except psutil.Error:
+    return None
+  rss = 0
+  cpu = 0.0
+  for process in processes:
+    try:
+      rss += process.memory_info().rss
+      times = process.cpu_times()
+      cpu += times.user + times.system
+    except psutil.Error:
+      continue
+  return rss / 1024 / 1024, cpu
+
+def report_usage(pid, label="browser"):
+  usage = process_tree_usage(pid)
+  if usage is None:
+    print(f"[{label}] 無法取得資源用量（需要安裝 psutil）")
+    return None
+  rss, cpu = usage
+  print(f"[{label}] memory {rss:.1f} MB, CPU {cpu:.1f} s")
+  return usage
+
+def report_driver_usage(driver, label="edge"):
+  # msedgedriver 的子程序即為瀏覽器本身
+  process = getattr(getattr(driver, 'service', None), 'process', None)
+  if process is None:
+    print(f"[{label}] 無法取得瀏覽器程序")
+    return None
+  return report_usage(process.pid, label)
+
+def is_browser_process(process):
+  try:
+    name = process.name().lower()
+  except psutil.Error:
+    return False
+  return "chrom" in name or "headless_shell" in name
+
+def playwright_browser_pids():
+  """
+  本程序啟動的每個 Playwright 瀏覽器主程序 pid（經由 node driver 啟動，父程序不是瀏覽器）。
+  瀏覽器的 renderer / GPU 等子程序屬於各自的主程序，不會單獨列出。沒有 psutil 時回傳空集合。
+  """
+  if psutil is None:
+    return set()
+  try:
+    descendants = psutil.Process(os.getpid()).children(recursive=True)
+  except psutil.Error:
+    return set()
+  pids = set()
+  for process in descendants:
+    try:
+      parent = process.parent()
+    except psutil.Error:
+      continue
+    if is_browser_process(process) and (parent is None or not is_browser_process(parent)):
+      pids.add(process.pid)
+  return pids
+
+def report_playwright_usage(pids=None, label="chromium"):
+  """
+  分別回報每個 Playwright 瀏覽器（主程序及其子程序）的資源用量，
+  pids 未指定時回報本程序啟動的所有瀏覽器。回傳 {pid: (RSS MB, CPU 秒數)}。
+  """
+  if psutil is None:
+    print(f"[{label}] 無法取得資源用量（需要安裝 psutil）")
+    return {}
+  if pids is None:
+    pids = playwright_browser_pids()
+  if not pids:
+    print(f"[{label}] 找不到瀏覽器程序")
+  usage = {}
+  for pid in sorted(pids):
+    result = report_usage(pid, f"{label} pid {pid}")
+    if result is not None:
+      usage[pid] = result
+  return usage
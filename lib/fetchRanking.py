@@ -0,0 +1,72 @@
+import requests
+from requests.adapters import HTTPAdapter
+from html.parser import HTMLParser
+
+RANKING_LABEL = 'app-overview-unified-kpi-category-ranking'
+VOID_TAGS = {'br', 'img', 'hr', 'input', 'meta', 'link', 'source', 'wbr'}
+BLOCK_TAGS = {'div', 'p', 'br', 'li', 'ul', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'table', 'tr'}
+REQUEST_TIMEOUT = 15
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36 Edg/124.0'
+
+# 收集 aria-labelledby 為排名標籤的 <span> 內所有文字，
+# 區塊元素換行、行內元素接續，與 Selenium 的 element.text 格式相同
+class RankingTextParser(HTMLParser):
+  def __init__(self):
+    super().__init__()
+    self.depth = 0
+    self.chunks = []
+    self.found = False
+
+  def text(self):
+    lines = [' '.join(line.split()) for line in ''.join(self.chunks).split('\n')]
+    return '\n'.join(line for line in lines if line)
+
+  def handle_starttag(self, tag, attrs):
+    if self.depth:
+      if tag in BLOCK_TAGS:
+        self.chunks.append('\n')
+      if tag not in VOID_TAGS:
+        self.depth += 1
+    elif not self.found and tag == 'span' and dict(attrs).get('aria-labelledby') == RANKING_LABEL:
+      self.depth = 1
+      self.found = True
+
+  def handle_endtag(self, tag):
+    if self.depth and tag not in VOID_TAGS:
+      if tag in BLOCK_TAGS:
+        self.chunks.append('\n')
+      self.depth -= 1
+
+  def handle_data(self, data):
+    if self.depth:
+      self.chunks.append(data)
+
+def parse_ranking_html(html):
+  parser = RankingTextParser()
+  parser.feed(html)
+  parser.close()
+  if not parser.found:
+    return None
+  return parser.text()
+
+def create_http_session(cookies, pool_size=10):
+  session = requests.Session()
+  adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+  session.mount('https://', adapter)
+  session.headers['User-Agent'] = USER_AGENT
+  # Selenium 的 cookie 格式轉成 requests 的 cookie jar
+  for cookie in cookies:
+    session.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain'), path=cookie.get('path', '/'))
+  return session
+
+def fetch_ranking_text(session, url, loginUrl, timeout=REQUEST_TIMEOUT):
+  """
+  以 HTTP 取得 overview 頁面並回傳排名文字，找不到時回傳 None，
+  讓呼叫端改用 Selenium 取得。
+  """
+  response = session.get(url, timeout=timeout)
+  response.raise_for_status()
+  if response.url.startswith(loginUrl):
+    print(f"HTTP 登入狀態失效：{url}")
+    return None
+  return parse_ranking_html(response.text)
@@ -2,18 +2,57 @@ from selenium import webdriver
 from selenium.webdriver.edge.options import Options as EdgeOptions
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import NoSuchElementException
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
 import os
 import re
+import json
+import queue
+import random
+import tempfile
+import threading
 from dotenv import load_dotenv
 import time
+from lib.fetchRanking import create_http_session, fetch_ranking_text
+from lib.browserProfile import apply_edge_profile, block_driver_requests, report_driver_usage
 
 load_dotenv()
 
+loginUrl = 'https://app.sensortower.com/users/sign_in'
+homeUrl = 'https://app.sensortower.com/'
+
+# 每個步驟等待頁面就緒的上限秒數
+LOGIN_TIMEOUT = 15
+RENDER_TIMEOUT = 10
+SESSION_CHECK_TIMEOUT = 5
+SESSION_FILE = os.environ.get("SENSORTOWER_SESSION_FILE", ".sensortower_session.json")
+RANKING_SELECTOR = 'div[role="listitem"] a span[aria-labelledby="app-overview-unified-kpi-category-ranking"]'
+
 empty_rank = {
     'rank': 'NA',
     'category': 'NA'
 }
 
+# 每個網址的結果狀態
+STATUS_OK = 'ok'
+STATUS_PARSE_FAILED = 'parse-failed'
+STATUS_LAYOUT_CHANGED = 'layout-changed'
+STATUS_TIMEOUT = 'timeout'
+STATUS_AUTH_EXPIRED = 'auth-expired'
+STATUS_ERROR = 'error'
+
+# 頁面可能只是還沒載完或暫時出錯，這些狀態值得重試
+RETRYABLE_STATUSES = {STATUS_LAYOUT_CHANGED, STATUS_TIMEOUT, STATUS_ERROR}
+MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY = 1.0
+# pooled 模式的 worker 共用：同一時間只有一個 worker 重新登入，其他 worker 沿用最近一次登入的 cookies
+RELOGIN_LOCK = threading.Lock()
+last_login = {'time': 0.0, 'cookies': None}
+
 # This function will parse the text_content and return structured data
 def parse_ranking_info(text_content):
     # Use regex to find the ranking number and category information
@@ -33,74 +72,376 @@ def parse_ranking_info(text_content):
         # Return None or handle error if parsing fails
         return None
 
-def get_ranking(urls = ['https://app.sensortower.com/overview/cyou.sk5s.app.answersai?country=TW'], autoLogin=True):
-  data = []
-  loginUrl = 'https://app.sensortower.com/users/sign_in'
-
+def create_driver():
   edge_options = EdgeOptions()
-  if False:
-      edge_options.add_argument("--headless")  # Run Chrome in headless mode
+  # 正式環境為無頭模式並停用 GPU、圖片；BROWSER_PROFILE=debug 時顯示視窗
+  apply_edge_profile(edge_options)
   edge_options.add_argument("--force-device-scale-factor=1")
   edge_options.add_argument("--window-size=1000,1350")
   edge_options.add_argument("--disable-pdf-viewer")
   edge_options.add_argument("--window-position=0,0")
 
   driver = webdriver.Edge(options=edge_options)
+  block_driver_requests(driver)
+  return driver
+
+def login(driver, autoLogin=True, timeout=LOGIN_TIMEOUT):
+  driver.get(loginUrl)
+  if autoLogin:
+    wait = WebDriverWait(driver, timeout)
+    email = os.environ.get("SENSORTOWER_EMAIL")
+    password = os.environ.get("SENSORTOWER_PASSWORD")
+    email_input = wait.until(EC.element_to_be_clickable((By.ID, "email")))
+    email_input.send_keys(email)
+    email_input.send_keys(Keys.RETURN)
+    password_input = wait.until(EC.element_to_be_clickable((By.ID, "password")))
+    password_input.send_keys(password)
+    password_input.send_keys(Keys.ENTER)
+    # 離開登入頁即代表登入完成
+    wait.until(lambda d: not d.current_url.startswith(loginUrl))
+  else:
+    input("Press Enter to continue after driver.get is executed...")
+
+# 把登入後的 cookies 帶到另一個瀏覽器，讓 worker 不必重新登入
+def share_session(driver, cookies):
+  # add_cookie 只能在同網域的頁面上呼叫
+  driver.get(homeUrl)
+  for cookie in cookies:
+    driver.add_cookie(cookie)
+
+def failed_result(status, attempts=1):
+  return dict(empty_rank, status=status, attempts=attempts)
+
+def parse_ranking_page(driver):
+  # Adjust the selector based on the actual HTML structure
+  # grid_elements = driver.find_elements(By.CLASS_NAME, "MuiGrid2-root")
+  grid_elements = driver.find_elements(By.CSS_SELECTOR, 'div[role="listitem"]')
+  if len(grid_elements) != 15:
+    print(f"找不到足夠的 MuiGrid-item 元素（{len(grid_elements)} 個）")
+    return failed_result(STATUS_LAYOUT_CHANGED)
+  seventh_element = grid_elements[13]  # 索引從 0 開始
 
   try:
-    if autoLogin:
-      driver.get(loginUrl)
-      driver.implicitly_wait(2)
-      email = os.environ.get("SENSORTOWER_EMAIL")
-      password = os.environ.get("SENSORTOWER_PASSWORD")
-      email_input = driver.find_element(By.ID, "email")
-      email_input.send_keys(email)
-      email_input.send_keys(Keys.RETURN)
-      time.sleep(1)
-      password_input = driver.find_element(By.ID, "password")
-      password_input.send_keys(password)
-      password_input.send_keys(Keys.ENTER)
-      time.sleep(1)
-    else:
-      driver.get(loginUrl)
-      input("Press Enter to continue after driver.get is executed...")
-    time.sleep(1)
-    for url in urls:
-      driver.get(url)
-      time.sleep(2)
-      # Adjust the selector based on the actual HTML structure
-      # grid_elements = driver.find_elements(By.CLASS_NAME, "MuiGrid2-root")
-      grid_elements = driver.find_elements(By.CSS_SELECTOR, 'div[role="listitem"]')
-      print(grid_elements)
-      if len(grid_elements) == 15:
-        seventh_element = grid_elements[13]  # 索引從 0 開始
+    # 在該元素內找到 <a> 標籤
+    a_tag = seventh_element.find_element(By.TAG_NAME, "a")
+
+    # 在 <a> 標籤內找到 <div> 並具有 aria-labelledby="app-overview-unified-kpi-category-ranking"
+    target_div = a_tag.find_element(By.XPATH, './/div//span[@aria-labelledby="app-overview-unified-kpi-category-ranking"]')
+  except NoSuchElementException:
+    print("找不到排名元素，頁面結構可能已變更")
+    return failed_result(STATUS_LAYOUT_CHANGED)
+
+  # 取得文字內容
+  text_content = target_div.text
+  rank = parse_ranking_info(text_content)
+  if not rank:
+    print(f"無法解析排名文字：{text_content!r}")
+    return failed_result(STATUS_PARSE_FAILED)
+  print(rank)
+  return dict(rank, status=STATUS_OK, attempts=1)
+
+def save_session(driver, path=SESSION_FILE):
+  cookies = driver.get_cookies()
+  # 每次寫入用不同的暫存檔，多個 worker 同時儲存時不會互相取代或刪掉對方的暫存檔；
+  # mkstemp 建立的檔案權限為 0600，cookies 等同登入憑證，只允許本人讀寫
+  fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=os.path.dirname(path) or '.')
+  try:
+    with os.fdopen(fd, 'w', encoding="utf-8") as f:
+      json.dump({'saved_at': time.time(), 'cookies': cookies}, f)
+    os.replace(tmp_path, path)
+  except BaseException:
+    os.remove(tmp_path)
+    raise
+
+def load_session(path=SESSION_FILE):
+  if not os.path.exists(path):
+    return None
+  try:
+    with open(path, 'r', encoding="utf-8") as f:
+      cookies = json.load(f)['cookies']
+  except (OSError, ValueError, KeyError) as e:
+    print(f"無法讀取登入快取：{e}")
+    return None
+  # 只丟掉已過期的 cookie（例如短效的分析、防機器人 cookie），
+  # 登入是否仍有效交給 restore_session 開頁面驗證
+  now = time.time()
+  valid = [cookie for cookie in cookies if 'expiry' not in cookie or cookie['expiry'] >= now]
+  if not valid:
+    print("登入快取已過期")
+    return None
+  return valid
+
+def restore_session(driver, path=SESSION_FILE, timeout=SESSION_CHECK_TIMEOUT):
+  cookies = load_session(path)
+  if not cookies:
+    return False
+  share_session(driver, cookies)
+  # 已登入時開啟登入頁會被導回首頁，停在登入頁代表快取失效
+  driver.get(loginUrl)
+  try:
+    WebDriverWait(driver, timeout).until(lambda d: not d.current_url.startswith(loginUrl))
+  except TimeoutException:
+    print("登入快取已失效，重新登入")
+    driver.delete_all_cookies()
+    return False
+  print("使用登入快取")
+  return True
+
+def relogin(driver, autoLogin=True, path=SESSION_FILE, since=0.0):
+  """
+  在 RELOGIN_LOCK 內重新登入並儲存登入快取。
+  若其他 worker 在 since（time.monotonic()）之後已經登入過，直接沿用那次的 cookies，不再重複登入。
+  """
+  with RELOGIN_LOCK:
+    if last_login['cookies'] and last_login['time'] >= since:
+      print("沿用其他 worker 重新登入的 cookies")
+      share_session(driver, last_login['cookies'])
+      return
+    login(driver, autoLogin)
+    last_login.update(time=time.monotonic(), cookies=driver.get_cookies())
+    # 快取寫不進去不影響這次爬取，下次執行再重新登入即可
+    try:
+      save_session(driver, path)
+    except OSError as e:
+      print(f"無法寫入登入快取：{e}")
+
+def ensure_login(driver, autoLogin=True, path=SESSION_FILE):
+  started = time.monotonic()
+  if restore_session(driver, path):
+    return
+  relogin(driver, autoLogin, path, since=started)
+
+def scrape_ranking(driver, url, timeout=RENDER_TIMEOUT, timings=None):
+  started = time.perf_counter()
+  driver.get(url)
+  navigated = time.perf_counter()
+  # 被導回登入頁代表登入狀態已失效
+  if driver.current_url.startswith(loginUrl):
+    return failed_result(STATUS_AUTH_EXPIRED)
+  # 等到排名區塊出現就開始解析，不再固定 sleep
+  timed_out = False
+  try:
+    WebDriverWait(driver, timeout).until(
+      EC.presence_of_element_located((By.CSS_SELECTOR, RANKING_SELECTOR))
+    )
+  except TimeoutException:
+    print(f"等待排名區塊逾時（{timeout} 秒）：{url}")
+    timed_out = True
+  rendered = time.perf_counter()
+  rank = parse_ranking_page(driver)
+  parsed = time.perf_counter()
+  # 逾時且頁面上完全沒有項目，視為載入逾時而非版面變更
+  if timed_out and rank['status'] == STATUS_LAYOUT_CHANGED and not driver.find_elements(By.CSS_SELECTOR, 'div[role="listitem"]'):
+    rank['status'] = STATUS_TIMEOUT
+
+  timing = {
+    'url': url,
+    'navigation': navigated - started,
+    'render': rendered - navigated,
+    'parse': parsed - rendered
+  }
+  if timings is not None:
+    timings.append(timing)
+  return rank
+
+def retry_delay(attempt, base=RETRY_BASE_DELAY):
+  # 指數退避加上隨機抖動，避免多個 worker 同時重試
+  return base * 2 ** (attempt - 1) + random.uniform(0, base)
+
+def scrape_with_retry(driver, url, autoLogin=True, timings=None, metrics=None, max_attempts=MAX_ATTEMPTS):
+  relogged = False
+  for attempt in range(1, max_attempts + 1):
+    started = time.monotonic()
+    try:
+      result = scrape_ranking(driver, url, timings=timings)
+    except TimeoutException:
+      result = failed_result(STATUS_TIMEOUT)
+    except Exception as e:
+      print(f"An error occurred while scraping {url}: {e}")
+      result = failed_result(STATUS_ERROR)
+    result['attempts'] = attempt
+
+    # 登入失效時重新登入一次再重試，手動登入模式無法在 worker 中進行；
+    # 多個 worker 同時失效時只有第一個真的登入，其餘沿用它的 cookies
+    if result['status'] == STATUS_AUTH_EXPIRED and autoLogin and not relogged and attempt < max_attempts:
+      relogged = True
+      try:
+        relogin(driver, autoLogin, since=started)
+        continue
+      except Exception as e:
+        print(f"重新登入失敗：{e}")
+        break
+    if result['status'] not in RETRYABLE_STATUSES or attempt == max_attempts:
+      break
+    delay = retry_delay(attempt)
+    print(f"{url} 狀態為 {result['status']}，{delay:.1f} 秒後重試（第 {attempt} 次）")
+    time.sleep(delay)
+
+  if metrics is not None:
+    metrics.record(result)
+  return result
+
+class ScrapeMetrics:
+  """
+  彙整所有網址的狀態與嘗試次數，可在多個 worker 間共用。
+  """
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.statuses = Counter()
+    self.attempts = 0
+    self.started = time.perf_counter()
+
+  def record(self, result):
+    with self.lock:
+      self.statuses[result['status']] += 1
+      self.attempts += result.get('attempts', 1)
 
+  def report(self):
+    total = sum(self.statuses.values())
+    elapsed = time.perf_counter() - self.started
+    print(f"Scrape metrics: {total} URLs, {self.attempts} attempts ({max(0, self.attempts - total)} retries), {elapsed:.1f}s")
+    if total and elapsed:
+      print(f"  throughput: {total / elapsed:.2f} URLs/s")
+    for status, count in sorted(self.statuses.items()):
+      print(f"  {status}: {count}")
+
+def print_timing_report(timings):
+  print("URL timing report (seconds): navigation / render wait / parse")
+  for timing in timings:
+    print(f"  {timing['navigation']:6.2f} / {timing['render']:6.2f} / {timing['parse']:6.2f}  {timing['url']}")
+  if timings:
+    for key in ['navigation', 'render', 'parse']:
+      total = sum(timing[key] for timing in timings)
+      print(f"  {key}: total {total:.2f}, avg {total / len(timings):.2f}")
+
+def get_ranking_pooled(urls, autoLogin=True, workers=4):
+  """
+  登入一次後，將 cookies 分享給多個 worker 瀏覽器，
+  以 workers 為上限同時爬取 urls，結果依輸入順序回傳。
+  """
+  data = [failed_result(STATUS_ERROR, attempts=0) for _ in urls]
+  timings = []
+  metrics = ScrapeMetrics()
+  jobs = queue.Queue()
+  for index, url in enumerate(urls):
+    jobs.put((index, url))
+
+  def worker(driver):
+    try:
+      while True:
         try:
-            # 在該元素內找到 <a> 標籤
-            a_tag = seventh_element.find_element(By.TAG_NAME, "a")
-
-            # 在 <a> 標籤內找到 <div> 並具有 aria-labelledby="app-overview-unified-kpi-category-ranking"
-            target_div = a_tag.find_element(By.XPATH, './/div//span[@aria-labelledby="app-overview-unified-kpi-category-ranking"]')
-
-            # 取得文字內容
-            text_content = target_div.text
-            rank = parse_ranking_info(text_content)
-            if rank:
-                print(rank)
-                data.append(rank)
-            else:
-                data.append(empty_rank)
-        except:
-           data.append(empty_rank)
-      else:
-        print("找不到足夠的 MuiGrid-item 元素")
-        data.append(empty_rank)
+          index, url = jobs.get_nowait()
+        except queue.Empty:
+          return
+        data[index] = scrape_with_retry(driver, url, autoLogin, timings, metrics)
+    finally:
+      report_driver_usage(driver, f"edge worker {threading.current_thread().name}")
+      driver.quit()
+
+  def start_worker(cookies):
+    driver = create_driver()
+    try:
+      share_session(driver, cookies)
+    except Exception:
+      driver.quit()
+      raise
+    worker(driver)
+
+  # 第一個瀏覽器負責登入，登入後直接當作 worker 使用
+  login_driver = create_driver()
+  try:
+    ensure_login(login_driver, autoLogin)
+    cookies = login_driver.get_cookies()
   except Exception as e:
+    login_driver.quit()
     print(f"An error occurred: {e}")
-    return "Ranking not found"
+    return data
+
+  pool_size = max(1, min(workers, len(urls)))
+  with ThreadPoolExecutor(max_workers=pool_size) as executor:
+    futures = [executor.submit(worker, login_driver)]
+    futures += [executor.submit(start_worker, cookies) for _ in range(pool_size - 1)]
+    for future in futures:
+      try:
+        future.result()
+      except Exception as e:
+        print(f"An error occurred in worker: {e}")
+  print_timing_report(timings)
+  metrics.report()
+  return data
+
+def get_session_cookies(autoLogin=True):
+  cookies = load_session()
+  if cookies:
+    return cookies
+  driver = create_driver()
+  try:
+    ensure_login(driver, autoLogin)
+    return driver.get_cookies()
   finally:
     driver.quit()
-    return data
+
+def get_ranking_http(urls, autoLogin=True, workers=1):
+  """
+  不開瀏覽器，直接用登入後的 cookies 以 HTTP 取得 overview 頁面並解析排名，
+  解析不到的網址再交給 Selenium 補爬。
+  """
+  data = [None] * len(urls)
+  try:
+    cookies = get_session_cookies(autoLogin)
+  except Exception as e:
+    print(f"An error occurred: {e}")
+    cookies = None
+
+  if cookies:
+    pool_size = max(1, min(workers, len(urls)))
+    session = create_http_session(cookies, pool_size)
+
+    def fetch(url):
+      try:
+        text_content = fetch_ranking_text(session, url, loginUrl)
+      except Exception as e:
+        print(f"HTTP 取得失敗 {url}: {e}")
+        return None
+      rank = parse_ranking_info(text_content) if text_content else None
+      return dict(rank, status=STATUS_OK, attempts=1) if rank else None
+
+    with session, ThreadPoolExecutor(max_workers=pool_size) as executor:
+      data = list(executor.map(fetch, urls))
+
+  missing = [index for index, rank in enumerate(data) if rank is None]
+  if missing:
+    print(f"HTTP 無法取得 {len(missing)} 筆排名，改用瀏覽器")
+    fallback = get_ranking([urls[index] for index in missing], autoLogin, workers)
+    for index, rank in zip(missing, fallback):
+      data[index] = rank
+  return data
+
+def get_ranking(urls = ['https://app.sensortower.com/overview/cyou.sk5s.app.answersai?country=TW'], autoLogin=True, workers=1, backend='selenium'):
+  if backend == 'http':
+    return get_ranking_http(urls, autoLogin, workers)
+  if workers > 1:
+    return get_ranking_pooled(urls, autoLogin, workers)
+
+  data = []
+  timings = []
+  metrics = ScrapeMetrics()
+  driver = create_driver()
+
+  try:
+    ensure_login(driver, autoLogin)
+    for url in urls:
+      data.append(scrape_with_retry(driver, url, autoLogin, timings, metrics))
+  except Exception as e:
+    print(f"An error occurred: {e}")
+  finally:
+    report_driver_usage(driver)
+    driver.quit()
+  # 中途失敗時，未處理的網址補上錯誤結果，回傳筆數與輸入一致
+  data += [failed_result(STATUS_ERROR, attempts=0) for _ in urls[len(data):]]
+  print_timing_report(timings)
+  metrics.report()
+  return data
 
 if __name__ == "__main__":
   try:
@@ -0,0 +1,118 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PATH = os.environ.get("LLM_CACHE_PATH", os.path.join(REPO_ROOT, ".llm_cache.db"))
+DEFAULT_TTL = int(os.environ.get("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+DEFAULT_MAX_MB = int(os.environ.get("LLM_CACHE_MAX_MB", "100"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+  key TEXT PRIMARY KEY,
+  model TEXT NOT NULL,
+  response TEXT NOT NULL,
+  size INTEGER NOT NULL,
+  created_at REAL NOT NULL,
+  accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at);
+"""
+
+def cache_key(model, contents, config=None):
+  """
+  以 (model, prompt 內容) 的 SHA-256 當作快取 key，contents 可為字串或字串清單。
+  有指定 config（例如 JSON response schema）時一併納入 key。
+  """
+  key_data = [model, contents] if config is None else [model, contents, config]
+  payload = json.dumps(key_data, ensure_ascii=False, sort_keys=True)
+  return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class LLMCache:
+  """
+  以 SQLite 保存 LLM 回應的磁碟快取，過期（ttl 秒）即失效，
+  總大小超過 max_mb 時依最後使用時間淘汰最舊的項目。可在多執行緒間共用。
+  """
+  def __init__(self, path=DEFAULT_PATH, ttl=DEFAULT_TTL, max_mb=DEFAULT_MAX_MB):
+    self.path = path
+    self.ttl = ttl
+    self.max_bytes = max_mb * 1024 * 1024
+    self.hits = 0
+    self.misses = 0
+    self.lock = threading.Lock()
+    self.conn = sqlite3.connect(path, check_same_thread=False)
+    self.conn.execute("PRAGMA journal_mode=WAL")
+    self.conn.executescript(SCHEMA)
+
+  def get(self, model, contents, config=None):
+    key = cache_key(model, contents, config)
+    now = time.time()
+    with self.lock:
+      row = self.conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+      if row and now - row[1] <= self.ttl:
+        with self.conn:
+          self.conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        return row[0]
+      if row:
+        with self.conn:
+          self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+      self.misses += 1
+      return None
+
+  def put(self, model, contents, response, config=None):
+    key = cache_key(model, contents, config)
+    now = time.time()
+    size = len(response.encode("utf-8"))
+    with self.lock, self.conn:
+      self.conn.execute(
+        "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+        (key, model, response, size, now, now)
+      )
+      self._evict(now)
+
+  def _evict(self, now):
+    self.conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+    total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    if total <= self.max_bytes:
+      return
+    # 從最久沒用到的開始刪，直到總大小回到上限內
+    for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+      if total <= self.max_bytes:
+        break
+      self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+      total -= size
+
+  def generate(self, client, model, contents, config=None):
+    """
+    有快取就直接回傳，否則呼叫 client.models.generate_content 並把結果存起來。
+    config 為 dict 形式的 GenerateContentConfig，回傳模型的文字回應。
+    """
+    cached = self.get(model, contents, config)
+    if cached is not None:
+      return cached
+    response = client.models.generate_content(model=model, contents=contents, config=config)
+    text = response.text
+    if text:
+      self.put(model, contents, text, config)
+    return text
+
+  def stats(self):
+    with self.lock:
+      total = self.hits + self.misses
+      return {
+        'hits': self.hits,
+        'misses': self.misses,
+        'hit_rate': self.hits / total if total else 0.0
+      }
+
+  def report(self):
+    stats = self.stats()
+    print(f"LLM cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
+
+  def close(self):
+    with self.lock:
+      self.conn.close()
@@ -0,0 +1,84 @@
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# 預設值可用環境變數調整，0 代表不限制
+DEFAULT_CONCURRENCY = int(os.environ.get("GEMINI_CONCURRENCY", "4"))
+DEFAULT_RPM = int(os.environ.get("GEMINI_RPM", "0"))
+DEFAULT_TPM = int(os.environ.get("GEMINI_TPM", "0"))
+
+def estimate_tokens(text):
+  """
+  粗估 token 數：中日韓文字約一字一 token，其餘約四個字元一 token。
+  """
+  cjk = sum(1 for ch in text if '　' <= ch <= '鿿' or '豈' <= ch <= '￯')
+  return cjk + (len(text) - cjk) // 4 + 1
+
+class RateLimiter:
+  """
+  以一分鐘滑動視窗限制請求數（rpm）與 token 數（tpm），可在多執行緒間共用。
+  """
+  def __init__(self, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM, window=60.0):
+    self.rpm = rpm
+    self.tpm = tpm
+    self.window = window
+    self.events = deque()
+    self.lock = threading.Lock()
+
+  def _usage(self, now):
+    while self.events and now - self.events[0][0] >= self.window:
+      self.events.popleft()
+    return len(self.events), sum(tokens for _, tokens in self.events)
+
+  def acquire(self, tokens=0):
+    """
+    等到送出這次請求不會超過限制為止，回傳等待的秒數。
+    """
+    waited = 0.0
+    while True:
+      with self.lock:
+        now = time.monotonic()
+        requests, used = self._usage(now)
+        over_rpm = self.rpm and requests >= self.rpm
+        # 單次請求超過整個 tpm 時只要求視窗內沒有其他請求，避免永遠等不到
+        over_tpm = self.tpm and used and used + tokens > self.tpm
+        if not over_rpm and not over_tpm:
+          self.events.append((now, tokens))
+          return waited
+        delay = self.window - (now - self.events[0][0])
+      delay = max(delay, 0.05)
+      time.sleep(delay)
+      waited += delay
+
+def run_blocks(fn, items, max_workers=DEFAULT_CONCURRENCY, limiter=None, tokens=None, on_start=None, on_done=None):
+  """
+  以最多 max_workers 個執行緒對 items 逐一呼叫 fn(item)，結果依輸入順序回傳。
+  每個結果為 (value, error, seconds)；fn 拋出的例外會放在 error，不影響其他區塊。
+  tokens(item) 用來估計送出的 token 數給 limiter 使用；
+  on_start(index) / on_done(index, value, error, seconds) 可用來回報進度。
+  """
+  items = list(items)
+
+  def run(index):
+    item = items[index]
+    if limiter is not None:
+      limiter.acquire(tokens(item) if tokens else 0)
+    if on_start:
+      on_start(index)
+    started = time.perf_counter()
+    value, error = None, None
+    try:
+      value = fn(item)
+    except Exception as e:
+      error = e
+    seconds = time.perf_counter() - started
+    if on_done:
+      on_done(index, value, error, seconds)
+    return value, error, seconds
+
+  if not items:
+    return []
+  with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as executor:
+    return list(executor.map(run, range(len(items))))
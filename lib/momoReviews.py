@@ -0,0 +1,63 @@
+import re
+import csv
+
+REVIEW_SELECTOR = ".reviewCardInner"
+CSV_HEADER = ["使用者", "規格", "日期", "評分", "留言內容"]
+DATE_PATTERN = re.compile(r"^\d{4}/\d{1,2}/\d{1,2}")
+
+def parse_review_text(text):
+  """
+  把一張評論卡的 innerText 轉成 [使用者, 規格, 日期, 評分, 留言內容]。
+  依內容判斷欄位，不依賴固定行號，缺少的欄位填 N/A。
+  """
+  lines = [line.strip() for line in text.split('\n') if line.strip()]
+  if not lines:
+    return None
+  user = lines[0].strip('*').strip()
+  spec, date, rating = "N/A", "N/A", "N/A"
+  rest = lines[1:]
+  if rest and rest[0].startswith("規格"):
+    spec = rest.pop(0).split(":", 1)[-1].strip()
+  if rest and DATE_PATTERN.match(rest[0]):
+    date = rest.pop(0)
+  if rest and (rest[0].isdigit() or "評等" in rest[0]):
+    rating = rest.pop(0)
+  comment = ''.join(rest).strip()
+  return [user, spec, date, rating, comment]
+
+def extract_reviews(page):
+  """
+  直接從目前頁面的 DOM 取出所有評論並解析成資料列。
+  所有卡片的文字以一次 evaluate 取回，不需逐一呼叫 inner_text。
+  """
+  texts = page.eval_on_selector_all(REVIEW_SELECTOR, "cards => cards.map(card => card.innerText)")
+  rows = []
+  for text in texts:
+    row = parse_review_text(text)
+    if row:
+      rows.append(row)
+  return rows
+
+class ReviewWriter:
+  """
+  逐頁寫入評論 CSV，每次寫入後 flush，爬到一半中斷也保有已完成的部分。
+  """
+  def __init__(self, filename):
+    self.filename = filename
+    self.count = 0
+    self.file = None
+    self.writer = None
+
+  def __enter__(self):
+    self.file = open(self.filename, "w", newline='', encoding="utf-8-sig")
+    self.writer = csv.writer(self.file)
+    self.writer.writerow(CSV_HEADER)
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    self.file.close()
+
+  def write_rows(self, rows):
+    self.writer.writerows(rows)
+    self.file.flush()
+    self.count += len(rows)
@@ -0,0 +1,43 @@
+from collections import namedtuple
+from lib.getRanking import get_ranking
+
+overviewUrl = 'https://app.sensortower.com/overview/{store_id}?country={region}'
+
+PLATFORMS = ['ios', 'android']
+
+class ScrapeJob(namedtuple('ScrapeJob', ['app_id', 'region', 'platform', 'url'])):
+  """
+  一個排名爬取任務，自帶識別用的 key，結果以 key 對應回來，
+  不依賴 URL 在清單中的位置。
+  """
+  __slots__ = ()
+
+  @property
+  def key(self):
+    return f"{self.app_id}_{self.region.lower()}_{self.platform}"
+
+def build_jobs(app_data):
+  """
+  由 apps.yaml 的內容建立所有 App x 地區 x 平台的任務，
+  沒有設定商店 id 的平台會被略過。
+  """
+  jobs = []
+  for app in app_data['apps']:
+    for region in app['regions']:
+      for platform in PLATFORMS:
+        store_id = (app.get(platform) or {}).get('id')
+        if store_id:
+          url = overviewUrl.format(store_id=store_id, region=region)
+          jobs.append(ScrapeJob(app['id'], region, platform, url))
+  return jobs
+
+def run_jobs(jobs, **kwargs):
+  """
+  執行任務並回傳 {job.key: ranking}，其餘參數直接交給 get_ranking。
+  每筆 ranking 都帶有 status，失敗的任務可用 --resume 重跑。
+  """
+  jobs = list(jobs)
+  if not jobs:
+    return {}
+  rankings = get_ranking([job.url for job in jobs], **kwargs)
+  return {job.key: ranking for job, ranking in zip(jobs, rankings)}
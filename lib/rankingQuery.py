@@ -0,0 +1,108 @@
+import pandas as pd
+from lib.rankingStore import DEFAULT_DB, open_store
+
+def load_history(path=DEFAULT_DB, start=None, end=None):
+  """
+  一次把排名歷史讀成欄位式 DataFrame：
+  date, key, app_id, region, platform, rank, category（無排名為 NaN）。
+  """
+  conditions = []
+  params = []
+  if start:
+    conditions.append("date >= ?")
+    params.append(start)
+  if end:
+    conditions.append("date <= ?")
+    params.append(end)
+  where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+  conn = open_store(path)
+  try:
+    df = pd.read_sql_query(
+      f"SELECT date, key, app_id, region, platform, rank, category FROM rankings {where} ORDER BY key, date",
+      conn, params=params
+    )
+  finally:
+    conn.close()
+  df['date'] = pd.to_datetime(df['date'])
+  df['rank'] = df['rank'].astype('float64')
+  return df
+
+def rank_matrix(df):
+  # 日期 x key 的排名矩陣，後續運算都以欄為單位向量化
+  return df.pivot(index='date', columns='key', values='rank').sort_index()
+
+def rank_deltas(df):
+  """
+  每個 key 與前一筆紀錄相比的排名變化，負值代表名次上升。
+  """
+  return rank_matrix(df).diff()
+
+def rolling_average(df, window=7):
+  return rank_matrix(df).rolling(window, min_periods=1).mean()
+
+def best_worst_days(df):
+  ranked = df.dropna(subset=['rank'])
+  if ranked.empty:
+    # 沒有任何數字排名時仍維持欄位型別，日期欄才能使用 .dt
+    return pd.DataFrame({
+      'best_rank': pd.Series(dtype='float64'),
+      'best_date': pd.Series(dtype='datetime64[ns]'),
+      'worst_rank': pd.Series(dtype='float64'),
+      'worst_date': pd.Series(dtype='datetime64[ns]')
+    })
+  grouped = ranked.groupby('key')['rank']
+  best = ranked.loc[grouped.idxmin(), ['key', 'rank', 'date']].set_index('key')
+  worst = ranked.loc[grouped.idxmax(), ['key', 'rank', 'date']].set_index('key')
+  return pd.DataFrame({
+    'best_rank': best['rank'],
+    'best_date': best['date'],
+    'worst_rank': worst['rank'],
+    'worst_date': worst['date']
+  })
+
+def category_changes(df):
+  """
+  回傳分類與同一 key 前一筆不同的紀錄，含前後分類。
+  """
+  ranked = df.dropna(subset=['category']).sort_values(['key', 'date'])
+  previous = ranked.groupby('key')['category'].shift()
+  changed = ranked[previous.notna() & (previous != ranked['category'])]
+  return changed.assign(previous_category=previous[changed.index])[
+    ['date', 'key', 'previous_category', 'category']
+  ]
+
+def summarize(df, window=7):
+  """
+  每個 key 一列的精簡摘要，給下游 agent 當作特徵使用。
+  """
+  if df.empty:
+    return pd.DataFrame()
+  matrix = rank_matrix(df)
+  latest_date = matrix.index[-1]
+  summary = pd.DataFrame({
+    'latest_rank': matrix.iloc[-1],
+    'change_1d': matrix.diff().iloc[-1],
+    f'avg_{window}d': matrix.rolling(window, min_periods=1).mean().iloc[-1],
+    'days_ranked': matrix.notna().sum(),
+  })
+  summary = summary.join(best_worst_days(df))
+  latest_category = df.sort_values('date').groupby('key')['category'].last()
+  summary['category'] = latest_category
+  summary['category_changes'] = category_changes(df).groupby('key').size()
+  summary['category_changes'] = summary['category_changes'].fillna(0).astype(int)
+  summary.index.name = 'key'
+  summary.attrs['latest_date'] = latest_date.strftime("%Y-%m-%d")
+  return summary
+
+def summary_records(df, window=7):
+  """
+  summarize 的結果轉成 list of dict，日期轉成字串，方便放進 prompt。
+  """
+  summary = summarize(df, window)
+  if summary.empty:
+    return []
+  summary = summary.reset_index()
+  for column in ['best_date', 'worst_date']:
+    summary[column] = pd.to_datetime(summary[column]).dt.strftime("%Y-%m-%d")
+  summary = summary.round(2).astype(object).where(summary.notna(), None)
+  return summary.to_dict(orient='records')
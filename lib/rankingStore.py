@@ -0,0 +1,128 @@
+import os
+import json
+import sqlite3
+
+DEFAULT_DB = "rankings.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rankings (
+  date TEXT NOT NULL,
+  key TEXT NOT NULL,
+  app_id TEXT NOT NULL,
+  region TEXT NOT NULL,
+  platform TEXT NOT NULL,
+  rank INTEGER,
+  category TEXT,
+  PRIMARY KEY (date, key)
+);
+CREATE INDEX IF NOT EXISTS idx_rankings_key_date ON rankings (key, date);
+CREATE INDEX IF NOT EXISTS idx_rankings_app_date ON rankings (app_id, date);
+"""
+
+def split_key(key):
+  # key 格式為 appId_region_platform，appId 本身可能含底線
+  app_id, region, platform = key.rsplit('_', 2)
+  return app_id, region, platform
+
+def to_row(date, key, ranking):
+  app_id, region, platform = split_key(key)
+  rank = ranking.get('rank')
+  category = ranking.get('category')
+  return (
+    date, key, app_id, region, platform,
+    rank if isinstance(rank, int) else None,
+    None if category == 'NA' else category
+  )
+
+def from_row(rank, category):
+  return {
+    'rank': 'NA' if rank is None else rank,
+    'category': 'NA' if category is None else category
+  }
+
+def open_store(path=DEFAULT_DB, legacy_json=None):
+  """
+  開啟排名資料庫，第一次建立時會匯入同目錄下舊的 rankings.json。
+  """
+  if legacy_json is None:
+    legacy_json = os.path.join(os.path.dirname(path), "rankings.json")
+  is_new = not os.path.exists(path)
+  conn = sqlite3.connect(path)
+  # WAL 讓寫入中斷時不會破壞既有資料，也不擋住讀取
+  conn.execute("PRAGMA journal_mode=WAL")
+  conn.executescript(SCHEMA)
+  if is_new and legacy_json and os.path.exists(legacy_json):
+    import_json(conn, legacy_json)
+  return conn
+
+def import_json(conn, filename):
+  with open(filename, 'r', encoding="utf-8") as f:
+    try:
+      all_rankings = json.load(f)
+    except json.JSONDecodeError:
+      print(f"無法解析 {filename}，略過匯入")
+      return
+  for date, rankings in all_rankings.items():
+    save_rankings(conn, date, rankings)
+  print(f"已從 {filename} 匯入 {len(all_rankings)} 天的排名")
+
+def save_rankings(conn, date, rankings):
+  """
+  寫入（或覆蓋）某一天的排名，只更新傳入的 key，整批在同一個交易內完成。
+  """
+  rows = [to_row(date, key, ranking) for key, ranking in rankings.items()]
+  with conn:
+    conn.executemany(
+      "INSERT OR REPLACE INTO rankings (date, key, app_id, region, platform, rank, category) "
+      "VALUES (?, ?, ?, ?, ?, ?, ?)",
+      rows
+    )
+
+def get_rankings_by_date(conn, date):
+  cursor = conn.execute(
+    "SELECT key, rank, category FROM rankings WHERE date = ? ORDER BY key", (date,)
+  )
+  return {key: from_row(rank, category) for key, rank, category in cursor}
+
+def get_history(conn, key=None, app_id=None, start=None, end=None):
+  """
+  依 key 或 app_id 與日期區間查詢排名，回傳 {date: {key: ranking}}，日期由舊到新。
+  """
+  conditions = []
+  params = []
+  if key:
+    conditions.append("key = ?")
+    params.append(key)
+  if app_id:
+    conditions.append("app_id = ?")
+    params.append(app_id)
+  if start:
+    conditions.append("date >= ?")
+    params.append(start)
+  if end:
+    conditions.append("date <= ?")
+    params.append(end)
+  where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+  cursor = conn.execute(
+    f"SELECT date, key, rank, category FROM rankings {where} ORDER BY date, key", params
+  )
+  history = {}
+  for date, row_key, rank, category in cursor:
+    history.setdefault(date, {})[row_key] = from_row(rank, category)
+  return history
+
+def load_rankings(path=DEFAULT_DB):
+  """
+  以 rankings.json 相同的格式讀出全部排名。
+  """
+  conn = open_store(path)
+  try:
+    return get_history(conn)
+  finally:
+    conn.close()
+
+def export_json(conn, filename="rankings.json"):
+  tmp_filename = f"{filename}.tmp"
+  with open(tmp_filename, 'w', encoding="utf-8") as f:
+    json.dump(get_history(conn), f, indent=4)
+  os.replace(tmp_filename, filename)
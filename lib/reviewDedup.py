@@ -0,0 +1,127 @@
+import os
+import re
+import random
+import hashlib
+from collections import Counter, defaultdict
+
+# 相似度門檻（bigram shingle 的 Jaccard 相似度），0 代表不做去重
+DEFAULT_THRESHOLD = float(os.environ.get("REVIEW_DEDUP_THRESHOLD", "0.7"))
+# 正規化後短於此長度的評論（例如「很好用」「不好用」）只合併完全相同者，避免一兩個字的差異翻轉語意
+MIN_FUZZY_LENGTH = 5
+# 否定與褒貶字：兩則評論這些字不同時（例如「推薦」與「不推薦」）一律不合併
+POLARITY_CHARS = frozenset("不沒没無无未別别難难非勿莫差爛烂壞坏")
+COUNT_COLUMN = "相似評論數"
+# 合併後保留整群的評分分布（例如「5×3、4×1」），評分統計不會只剩代表評論的那一筆
+RATINGS_COLUMN = "相似評論評分"
+
+NUM_PERM = 64
+# 32 段 × 2 列：Jaccard 0.7 的配對幾乎都會成為候選，誤判的候選再由實際 Jaccard 排除
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+PRIME = (1 << 61) - 1
+# 固定種子，讓每次執行的分群（以及送出的 prompt）都相同，LLM 快取才會命中
+_rng = random.Random(20250101)
+PERMUTATIONS = [(_rng.randrange(1, PRIME), _rng.randrange(0, PRIME)) for _ in range(NUM_PERM)]
+
+NOISE = re.compile(r"[\s\W_]+")
+
+def normalize(text):
+  """
+  去掉空白與標點並轉成小寫，只比較文字本身。
+  """
+  if not isinstance(text, str):
+    return ""
+  return NOISE.sub("", text).lower()
+
+def shingles(text, size=2):
+  """
+  連續 size 個字的字元 shingle；短於 MIN_FUZZY_LENGTH 的評論回傳空集合，只做完全比對。
+  """
+  if len(text) < MIN_FUZZY_LENGTH:
+    return set()
+  return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+def polarity(text):
+  return Counter(ch for ch in text if ch in POLARITY_CHARS)
+
+def _hash(shingle):
+  return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+
+def minhash(shingle_set):
+  hashes = [_hash(s) for s in shingle_set]
+  return [min((a * h + b) % PRIME for h in hashes) for a, b in PERMUTATIONS]
+
+def jaccard(a, b):
+  return len(a & b) / len(a | b) if a or b else 1.0
+
+def cluster_texts(texts, threshold=DEFAULT_THRESHOLD):
+  """
+  以 MinHash + LSH 找出候選，再用實際的 Jaccard 相似度確認，把近似重複的文字分群。
+  短評只合併正規化後完全相同者；否定／褒貶字不同的評論不會合併。
+  回傳 (representatives, clusters)：representatives 為每群代表（第一次出現者）的位置，
+  clusters[i] 為第 i 筆所屬的群組編號（對應 representatives 的索引）。
+  """
+  if threshold <= 0:
+    return list(range(len(texts))), list(range(len(texts)))
+  representatives = []
+  rep_shingles = []
+  rep_polarity = []
+  clusters = []
+  buckets = defaultdict(list)
+  exact = {}
+  for i, text in enumerate(texts):
+    norm = normalize(text)
+    if norm in exact:
+      clusters.append(exact[norm])
+      continue
+    current = shingles(norm)
+    current_polarity = polarity(norm)
+    signature = minhash(current) if current else None
+    keys = []
+    match = None
+    if signature:
+      keys = [(band, tuple(signature[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS)]
+      seen = set()
+      for key in keys:
+        for group in buckets[key]:
+          if group not in seen:
+            seen.add(group)
+            if rep_polarity[group] == current_polarity and jaccard(current, rep_shingles[group]) >= threshold:
+              match = group
+              break
+        if match is not None:
+          break
+    if match is None:
+      match = len(representatives)
+      representatives.append(i)
+      rep_shingles.append(current)
+      rep_polarity.append(current_polarity)
+      for key in keys:
+        buckets[key].append(match)
+    exact[norm] = match
+    clusters.append(match)
+  return representatives, clusters
+
+def rating_summary(values):
+  """
+  依第一次出現的順序列出每個評分與次數，例如「5×3、4×1」。
+  """
+  counts = Counter(str(value) for value in values)
+  return "、".join(f"{value}×{count}" for value, count in counts.items())
+
+def dedup_reviews(df, column="留言內容", threshold=DEFAULT_THRESHOLD, rating_column="評分"):
+  """
+  每群近似重複的評論只保留第一筆，並加上「相似評論數」欄位記錄該群筆數；
+  有 rating_column 時再加上「相似評論評分」欄位，保留整群的評分分布。
+  其餘欄位（使用者、日期等）只保留代表評論的值，回傳代表評論的 DataFrame。
+  """
+  representatives, clusters = cluster_texts(df[column].tolist(), threshold)
+  counts = [0] * len(representatives)
+  for group in clusters:
+    counts[group] += 1
+  deduped = df.iloc[representatives].copy()
+  deduped[COUNT_COLUMN] = counts
+  if rating_column in df.columns:
+    ratings = df[rating_column].groupby(clusters, sort=True).agg(rating_summary)
+    deduped[RATINGS_COLUMN] = ratings.tolist()
+  return deduped.reset_index(drop=True)
@@ -1,29 +1,32 @@
 import os
-import json
+import sys
 import yaml
 from datetime import date
-from lib.getRanking import get_ranking
+from lib.rankingJobs import build_jobs, run_jobs
+from lib.rankingStore import DEFAULT_DB, open_store, save_rankings, get_rankings_by_date
 
-def save_rankings_to_file(rankings, filename="rankings.json"):
+def save_rankings_to_store(rankings, filename=DEFAULT_DB):
     today = date.today().strftime("%Y-%m-%d")
     filepath = os.path.join(os.getcwd(), filename)
 
-    # Load existing data if the file exists
-    if os.path.exists(filepath):
-        with open(filepath, 'r', encoding="utf-8") as f:
-            try:
-                all_rankings = json.load(f)
-            except json.JSONDecodeError:
-                all_rankings = {}
-    else:
-        all_rankings = {}
+    # 只寫入今天的資料，不需重寫整份歷史
+    conn = open_store(filepath)
+    try:
+        save_rankings(conn, today, rankings)
+    finally:
+        conn.close()
 
-    # Add/Overwrite today's rankings
-    all_rankings[today] = rankings
+def get_collected_keys(filename=DEFAULT_DB):
+    today = date.today().strftime("%Y-%m-%d")
+    filepath = os.path.join(os.getcwd(), filename)
 
-    # Write the updated data back to the file
-    with open(filepath, 'w', encoding="utf-8") as f:
-        json.dump(all_rankings, f, indent=4)
+    conn = open_store(filepath)
+    try:
+        existing = get_rankings_by_date(conn, today)
+    finally:
+        conn.close()
+    # 排名為 NA 的視為尚未成功取得，需要重爬
+    return {key for key, ranking in existing.items() if ranking['rank'] != 'NA'}
 
 if __name__ == "__main__":
     try:
@@ -31,35 +34,33 @@ if __name__ == "__main__":
         with open("apps.yaml", 'r', encoding="utf-8") as yaml_file:
             app_data = yaml.safe_load(yaml_file)
 
-        # Extract app URLs and IDs
-        rankings = {}
-        app_urls = []
-        for app in app_data['apps']:
-            app_id = app['id']
-            regions = app['regions']
-            for region in regions:
-                if ('ios' in app) and app['ios']['id']:
-                    app_urls.append(f"https://app.sensortower.com/overview/{app['ios']['id']}?country={region}")
-                if ('android' in app) and app['android']['id']:
-                    app_urls.append(f"https://app.sensortower.com/overview/{app['android']['id']}?country={region}")
+        # 每個任務自帶 appId / region / platform，結果以 key 對應
+        jobs = build_jobs(app_data)
+
+        # --resume: 只爬今天還沒取得（或為 NA）的項目，其餘保留既有資料
+        if "--resume" in sys.argv:
+            collected = get_collected_keys()
+            pending = [job for job in jobs if job.key not in collected]
+            print(f"今天已取得 {len(jobs) - len(pending)} 筆，剩餘 {len(pending)} 筆需要爬取")
+            jobs = pending
 
         # Get rankings for each app and region
-        if app_urls:
-            app_rankings = get_ranking(app_urls)
-            index = 0
-            for app in app_data['apps']:
-                app_id = app['id']
-                regions = app['regions']
-                for region in regions:
-                    if ('ios' in app):
-                        rankings[f"{app_id}_{region.lower()}_ios"] = {key: app_rankings[index][key] for key in ['rank', 'category']}
-                        index += 1
-                    if ('android' in app):
-                        rankings[f"{app_id}_{region.lower()}_android"] = {key: app_rankings[index][key] for key in ['rank', 'category']}
-                        index += 1
+        # SENSORTOWER_WORKERS > 1 時同時爬取多個網址
+        # SENSORTOWER_BACKEND=http 時先以 HTTP 取得，失敗的網址再用瀏覽器
+        workers = int(os.environ.get("SENSORTOWER_WORKERS", "1"))
+        backend = os.environ.get("SENSORTOWER_BACKEND", "selenium")
+        results = run_jobs(jobs, workers=workers, backend=backend)
+        rankings = {
+            app_key: {key: app_ranking[key] for key in ['rank', 'category']}
+            for app_key, app_ranking in results.items()
+        }
+        failed = {app_key: result['status'] for app_key, result in results.items() if result.get('status', 'ok') != 'ok'}
+        if failed:
+            print(f"以下項目未取得排名，可用 --resume 重試：{failed}")
 
         print(f"Today's rankings: {rankings}")
-        save_rankings_to_file(rankings)
-        print("Rankings saved to rankings.json")
+        # 只寫入這次爬到的 key，今天已存在的其他資料不受影響
+        save_rankings_to_store(rankings)
+        print(f"Rankings saved to {DEFAULT_DB}")
     except Exception as e:
         print(f"An error occurred: {e}")
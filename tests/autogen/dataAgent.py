@@ -1,7 +1,7 @@
 import os
+import sys
 import asyncio
 import pandas as pd
-import json
 from dotenv import load_dotenv
 
 # 根據你的專案結構調整下列 import
@@ -12,6 +12,10 @@ from autogen_agentchat.messages import TextMessage
 from autogen_ext.models.openai import OpenAIChatCompletionClient
 from autogen_ext.agents.web_surfer import MultimodalWebSurfer
 
+# 讓此腳本可以使用專案根目錄的 lib
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from lib.rankingQuery import load_history, summary_records
+
 load_dotenv()
 
 async def process_chunk(chunk, start_idx, total_records, model_client, termination_condition):
@@ -33,7 +37,7 @@ async def process_chunk(chunk, start_idx, total_records, model_client, terminati
         f"以下為該批次資料:\n{chunk_data}\n\n"
         "請根據以上資料進行分析，並提供完整的開發者ASO建議。"
         "其中請特別注意：\n"
-        "  1. 分析不同日期的排名變化（Naming rule: appName_region_platform）；\n"
+        "  1. 根據排名摘要（最新排名、單日變化、7日平均、最佳/最差日、分類變動）分析排名趨勢（Naming rule: appName_region_platform）；\n"
         "  2. 請 MultimodalWebSurfer 搜尋外部網站，找出最新App開發者資訊資訊（例如趨勢、平台、政策更變等），\n"
         "     並將搜尋結果整合進回覆中；\n"
         "  3. 最後請提供具體的建議和相關參考資訊。\n"
@@ -82,13 +86,11 @@ async def main():
     
     # 使用 pandas 以 chunksize 方式讀取 CSV 檔案
     # HW1: Change dataset
-    json_file_path = "../../rankings.json"
+    # 先把排名歷史整理成每個 App 一列的特徵摘要，不再直接丟原始 JSON
+    db_path = "../../rankings.db"
     chunk_size = 2
-    with open(json_file_path, 'r') as file:
-        data = json.load(file)
+    items = summary_records(load_history(db_path))
     chunks = []
-    # Convert the data to a list of tuples if it's a dictionary
-    items = list(data.items()) if isinstance(data, dict) else data
     # Create chunks of data
     for i in range(0, len(items), chunk_size):
         chunk = items[i:i + chunk_size]
@@ -1,30 +1,28 @@
-import json
+import os
+import sys
 
-# Open the JSON file and load it into a Python dictionary
-with open('../../rankings.json', 'r') as file:
-    data = json.load(file)
+# 讓此腳本可以使用專案根目錄的 lib
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from lib.rankingQuery import load_history, rank_deltas, rolling_average, summarize
+
+# 一次把排名歷史讀成 DataFrame
+df = load_history('../../rankings.db')
 
 # Accessing data for a specific date and app
 date = '2025-03-18'
-app = 'wis_tw_ios'
+app = 'wis'
+key = 'wis_tw_ios'
 
 # Access the rank and category for a specific app on a specific date
-if date in data and app in data[date]:
-    chunks = []
-    # Define the chunk size
-    chunk_size = 2
-
-    # Convert the data to a list of tuples if it's a dictionary
-    items = list(data.items()) if isinstance(data, dict) else data
-
-    # Create chunks of data
-    for i in range(0, len(items), chunk_size):
-        chunk = items[i:i + chunk_size]
-        chunks.append(chunk)
+record = df[(df['date'] == date) & (df['key'] == key)]
+if not record.empty:
+    print(f"{key} on {date}:")
+    print(record[['rank', 'category']].to_string(index=False))
 
-    # For debugging purposes, you can print the chunks
-    for index, chunk in enumerate(chunks):
-        print(f"Chunk {index + 1}: {chunk}")
-    # print(f"Data chunks for {app} on {date}: {chunks}")
+    # For debugging purposes, you can print the precomputed features
+    app_df = df[df['app_id'] == app]
+    print(f"Rank deltas for {app}:\n{rank_deltas(app_df)}")
+    print(f"7-day rolling average for {app}:\n{rolling_average(app_df)}")
+    print(f"Summary for {app}:\n{summarize(app_df).to_string()}")
 else:
-    print(f"No data found for {app} on {date}")
+    print(f"No data found for {key} on {date}")
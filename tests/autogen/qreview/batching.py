@@ -0,0 +1,264 @@
+import time
+import json
+import bisect
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from lib.llmRunner import RateLimiter, estimate_tokens
+
+def response_config(items):
+    """
+    產生要求模型回傳 JSON 陣列的 GenerateContentConfig（dict 形式）。
+    陣列中每個物件帶有對應輸入列的 id，以及每個評分項目的字串欄位。
+    """
+    properties = {"id": {"type": "INTEGER"}}
+    for item in items:
+        properties[item] = {"type": "STRING"}
+    return {
+        "response_mime_type": "application/json",
+        "response_schema": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": properties,
+                "required": ["id"] + list(items)
+            }
+        }
+    }
+
+def format_rows(texts):
+    """
+    將每筆輸入轉成一行帶 id 的 JSON（id 從 1 開始），供提示使用。
+    """
+    return "\n".join(json.dumps({"id": i, "text": str(text)}, ensure_ascii=False)
+                     for i, text in enumerate(texts, start=1))
+
+def parse_rows(response_text, count, items):
+    """
+    一次解析整批 JSON 陣列回應，依 id 對回輸入順序。
+    回傳長度為 count 的清單，缺少或重複的 id 位置為 None；整份無法解析時全部為 None。
+    """
+    results = [None] * count
+    try:
+        rows = json.loads(response_text)
+    except (TypeError, ValueError) as e:
+        print(f"解析 JSON 失敗：{e}")
+        return results
+    if not isinstance(rows, list):
+        print("回傳內容不是 JSON 陣列")
+        return results
+    for row in rows:
+        if not isinstance(row, dict):
+            continue
+        row_id = row.get("id")
+        if not isinstance(row_id, int) or not 1 <= row_id <= count or results[row_id - 1] is not None:
+            continue
+        results[row_id - 1] = {item: str(row.get(item) or "").strip() for item in items}
+    missing = results.count(None)
+    if missing:
+        print(f"回傳缺少 {missing} 筆 id（共 {count} 筆）")
+    return results
+
+class AdaptiveBatcher:
+    """
+    依 token 估計決定每批筆數的批次標記器。
+
+    label_fn(texts) 需回傳與 texts 等長的清單，缺少結果的位置為 None。
+    整批都有結果時逐步放大批次；有缺漏時縮小批次，
+    並只把缺少結果的列重新送出（整批失敗時對半拆開）。
+    重試後仍失敗的列在 label() 的結果中為 None，呼叫端不應把它們記為已完成。
+    每次 API 呼叫前先經過 RateLimiter，取代固定的 time.sleep。
+    label() 可同時在多個執行緒呼叫，共用同一個批次大小與 RateLimiter。
+
+    prelabel(text) 為選用的本地判定，回傳 preclassify.Prelabel 或 None：
+    complete 的列直接使用本地結果、不送給模型，其餘列的本地結果會覆蓋在模型結果上。
+    """
+
+    def __init__(self, label_fn, empty_result, limiter=None, start_size=10, min_size=1, max_size=50,
+                 max_tokens=4000, max_retries=3, retry_delay=2.0, prelabel=None):
+        self.label_fn = label_fn
+        self.empty_result = empty_result
+        self.prelabel = prelabel
+        self.limiter = limiter or RateLimiter()
+        self.size = start_size
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_tokens = max_tokens
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.calls = 0
+        self.resubmitted = 0
+        self.failed = 0
+        self.rows = 0
+        self.local_rows = 0
+        self.local_batches = 0
+        self.lock = threading.Lock()
+
+    def next_batch_size(self, texts, start=0):
+        """
+        從 texts[start] 開始，在目前批次大小與 token 上限內能放入幾筆（至少一筆）。
+        本地即可判定的列不佔批次大小與 token，但整批最多涵蓋 max_size 的數倍列。
+        """
+        count = 0
+        sent = 0
+        tokens = 0
+        for text in texts[start:start + self.max_size * 4]:
+            if self._local(text) is None:
+                text_tokens = estimate_tokens(str(text))
+                if sent and (sent >= self.size or tokens + text_tokens > self.max_tokens):
+                    break
+                sent += 1
+                tokens += text_tokens
+            count += 1
+        return max(count, 1)
+
+    def label(self, texts):
+        """
+        標記 texts 並回傳等長、順序相同的結果清單，重試後仍失敗的列為 None。
+        """
+        results = [None] * len(texts)
+        send = []
+        partial = {}
+        for i, text in enumerate(texts):
+            prelabel = self.prelabel(text) if self.prelabel else None
+            if prelabel and prelabel.complete:
+                results[i] = dict(self.empty_result(), **prelabel.labels)
+                continue
+            send.append(i)
+            if prelabel and prelabel.labels:
+                partial[i] = prelabel.labels
+        self._count("rows", len(texts))
+        self._count("local_rows", len(texts) - len(send))
+        if send:
+            self._label(texts, send, results)
+        elif texts:
+            self._count("local_batches")
+        for i, labels in partial.items():
+            if results[i] is None:
+                continue
+            results[i].update({item: value for item, value in labels.items() if value})
+        return results
+
+    def _local(self, text):
+        """
+        本地即可完整判定時回傳 Prelabel，否則回傳 None。
+        """
+        if self.prelabel is None:
+            return None
+        prelabel = self.prelabel(text)
+        return prelabel if prelabel and prelabel.complete else None
+
+    def _grow(self):
+        with self.lock:
+            self.size = min(self.max_size, max(self.size + 1, int(self.size * 1.5)))
+
+    def _shrink(self):
+        with self.lock:
+            self.size = max(self.min_size, self.size // 2)
+
+    def _count(self, name, n=1):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def _call(self, batch):
+        for attempt in range(1, self.max_retries + 1):
+            self.limiter.acquire(sum(estimate_tokens(str(text)) for text in batch))
+            self._count("calls")
+            try:
+                return self.label_fn(batch)
+            except Exception as e:
+                delay = self.retry_delay * 2 ** (attempt - 1) + random.uniform(0, self.retry_delay)
+                print(f"API 呼叫失敗（第 {attempt} 次）：{e}")
+                if attempt < self.max_retries:
+                    time.sleep(delay)
+        return None
+
+    def _label(self, texts, indices, results):
+        batch_results = self._call([texts[i] for i in indices])
+        if batch_results is None:
+            # 重試後仍失敗：結果維持 None，流程繼續，之後可用 --resume 重新送出
+            self._count("failed", len(indices))
+            return
+
+        missing = []
+        for i, result in zip(indices, batch_results):
+            if result is None:
+                missing.append(i)
+            else:
+                results[i] = result
+        if not missing:
+            self._grow()
+            return
+
+        self._shrink()
+        if len(indices) == 1:
+            self._count("failed")
+            return
+        self._count("resubmitted", len(missing))
+        if len(missing) == len(indices):
+            # 整批錯位：對半拆開，各自重新送出
+            middle = len(indices) // 2
+            self._label(texts, indices[:middle], results)
+            self._label(texts, indices[middle:], results)
+        else:
+            print(f"{len(missing)} 筆缺少結果，只重新送出這些列")
+            self._label(texts, missing, results)
+
+    def report(self):
+        print(f"批次統計：API 呼叫 {self.calls} 次，重送 {self.resubmitted} 列，"
+              f"放棄 {self.failed} 列，目前批次大小 {self.size}")
+        if self.failed:
+            print(f"{self.failed} 列沒有結果（輸出為空白），未記入檢查點，可用 --resume 重新送出")
+        if self.prelabel and self.rows:
+            # 呼叫次數大致與送出的列數成正比，以本地判定的列數比例估計省下的呼叫
+            print(f"本地判定 {self.local_rows} / {self.rows} 列，估計省下 {self.local_rows / self.rows:.0%} 的 API 呼叫"
+                  f"（{self.local_batches} 個批次完全不需呼叫）")
+
+def run_batches(batcher, texts, start=0, workers=1, completed=None, on_done=None):
+    """
+    從 texts[start] 開始切批次標記，最多 workers 個批次同時呼叫 API。
+    結果可能亂序完成，但一律依列順序 yield (start, end, results)。
+    同時保留的批次（執行中加上等待寫出）不超過 workers * 2 個，記憶體用量有上限。
+
+    completed 為 {start: (end, labels)}（例如檢查點中已完成的批次），這些範圍直接沿用不再呼叫 API。
+    on_done(start, end, results) 在每個批次完成時呼叫（完成順序），可用來立即寫入檢查點；
+    results 中失敗的列為 None。
+    """
+    total = len(texts)
+    workers = max(1, workers)
+    completed = completed or {}
+    completed_starts = sorted(completed)
+    window = workers * 2
+    pending = {}
+    ready = {}
+    next_start = start
+    write_idx = start
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while write_idx < total:
+            while next_start < total and len(pending) + len(ready) < window:
+                if next_start in completed:
+                    end, labels = completed[next_start]
+                    ready[next_start] = (end, labels)
+                else:
+                    end = next_start + batcher.next_batch_size(texts, next_start)
+                    # 不與後面已完成的範圍重疊
+                    following = bisect.bisect_right(completed_starts, next_start)
+                    if following < len(completed_starts):
+                        end = min(end, completed_starts[following])
+                    future = executor.submit(batcher.label, texts[next_start:end])
+                    pending[future] = (next_start, end)
+                next_start = end
+
+            while write_idx in ready:
+                end, labels = ready.pop(write_idx)
+                yield write_idx, end, labels
+                write_idx = end
+
+            if write_idx < total:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch_start, batch_end = pending.pop(future)
+                    results = future.result()
+                    if on_done:
+                        on_done(batch_start, batch_end, results)
+                    ready[batch_start] = (batch_end, results)
@@ -0,0 +1,150 @@
+import os
+import json
+from csvstream import read_chunks, CsvOutput
+
+class Checkpoint:
+    """
+    記錄已完成批次的檢查點檔（JSON Lines）。
+    第一行記錄輸入檔路徑與大小，之後每行為一個完成的批次：{"start", "end", "labels"}。
+    每個批次寫入後立即 fsync，中斷時最後一行若不完整會在載入時略過。
+    ranges 只保存每個批次的範圍與它在檔案中的位置 {start: (end, position)}，
+    標記結果需要時才逐段從檔案讀取，續跑大型檔案時記憶體用量不隨筆數增加。
+    """
+
+    def __init__(self, path, source):
+        self.path = path
+        self.source = os.path.abspath(source)
+        self.size = os.path.getsize(source)
+        self.ranges = {}
+
+    def load(self):
+        """
+        逐行讀取既有檢查點，只記下每個批次的範圍與位置。檔案不存在或與目前輸入檔不符時回傳 False。
+        """
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, "rb+") as f:
+            try:
+                header = json.loads(f.readline())
+            except ValueError:
+                return False
+            if header.get("source") != self.source or header.get("size") != self.size:
+                print(f"檢查點 {self.path} 與輸入檔不符，將重新開始")
+                return False
+            self.ranges = {}
+            position = f.tell()
+            for line in iter(f.readline, b""):
+                if not line.endswith(b"\n"):
+                    # 中斷時寫到一半的最後一行：截掉，避免之後附加的紀錄接在同一行
+                    f.truncate(position)
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    entry = None
+                if entry and entry["end"] - entry["start"] == len(entry["labels"]):
+                    self.ranges[entry["start"]] = (entry["end"], position)
+                position += len(line)
+        return True
+
+    def reset(self):
+        self.ranges = {}
+        self._write(json.dumps({"source": self.source, "size": self.size}), mode="w")
+
+    def record(self, start, end, labels):
+        """
+        記錄 [start, end) 的結果。失敗的列（None）不寫入，只記錄其前後連續成功的範圍，
+        --resume 時這些列會重新送出。
+        """
+        # 只寫入檔案，不加入 ranges；ranges 只在 load() 時由檔案建立
+        run_start = None
+        for i, label in enumerate(list(labels) + [None]):
+            if label is not None and run_start is None:
+                run_start = i
+            elif label is None and run_start is not None:
+                self._write(json.dumps({"start": start + run_start, "end": start + i,
+                                        "labels": labels[run_start:i]}, ensure_ascii=False))
+                run_start = None
+
+    def resume_point(self):
+        """
+        從第 0 列起連續完成的最後位置，也就是要從哪一列繼續處理。
+        """
+        start = 0
+        while start in self.ranges:
+            start = self.ranges[start][0]
+        return start
+
+    def iter_labels(self, end):
+        """
+        依列順序逐段產生 [0, end) 的標記結果（每次一個批次的 list），end 須為 resume_point() 以內的位置。
+        """
+        start = 0
+        with open(self.path, "rb") as f:
+            while start < end:
+                range_end, labels = self._read(f, start)
+                yield labels[:end - start]
+                start = range_end
+
+    def completed_in(self, offset, count):
+        """
+        回傳落在 [offset, offset + count) 內的已完成範圍，位置改為相對於 offset。
+        只讀取這個範圍內的批次。
+        """
+        starts = [start for start, (end, _) in self.ranges.items() if offset <= start and end <= offset + count]
+        if not starts:
+            return {}
+        completed = {}
+        with open(self.path, "rb") as f:
+            for start in starts:
+                end, labels = self._read(f, start)
+                completed[start - offset] = (end - offset, labels)
+        return completed
+
+    def _read(self, f, start):
+        end, position = self.ranges[start]
+        f.seek(position)
+        return end, json.loads(f.readline())["labels"]
+
+    def _write(self, line, mode="a"):
+        with open(self.path, mode, encoding="utf-8") as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+def labelled_frame(rows, results, items):
+    # 失敗的列（None）輸出為空白
+    frame = rows.copy()
+    for item in items:
+        frame[item] = [res.get(item, "") if res else "" for res in results]
+    return frame
+
+def restore_output(input_csv, checkpoint, items, output_csv):
+    """
+    依檢查點重建輸出 CSV（分段讀取輸入，先寫暫存檔再取代），避免中斷時殘留半個批次或重複的列。
+    輸入與檢查點都逐段讀取，記憶體中只保留一段輸入與尚未寫出的一個批次。
+    回傳要繼續處理的起始列。
+    """
+    start = checkpoint.resume_point()
+    if os.path.exists(output_csv):
+        os.remove(output_csv)
+    if start:
+        tmp_path = output_csv + ".tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        batches = checkpoint.iter_labels(start)
+        pending = []
+        offset = 0
+        with CsvOutput(tmp_path) as output:
+            for chunk in read_chunks(input_csv):
+                if offset >= start:
+                    break
+                rows = chunk.iloc[:start - offset]
+                while len(pending) < len(rows):
+                    pending.extend(next(batches))
+                output.write(labelled_frame(rows, pending[:len(rows)], items))
+                del pending[:len(rows)]
+                offset += len(chunk)
+        batches.close()
+        os.replace(tmp_path, output_csv)
+    return start
@@ -0,0 +1,52 @@
+import os
+import time
+import pandas as pd
+
+# 每次從輸入 CSV 讀進記憶體的列數
+CHUNK_ROWS = int(os.environ.get("QREVIEW_CHUNK_ROWS", "1000"))
+
+def read_chunks(path, chunksize=CHUNK_ROWS, **kwargs):
+    """
+    以 chunksize 分段讀取 CSV，記憶體用量不隨檔案大小增加。
+    """
+    return pd.read_csv(path, chunksize=chunksize, **kwargs)
+
+class CsvOutput:
+    """
+    整個處理過程只開一次的 CSV 輸出檔。
+    寫入先進緩衝區，累積 flush_rows 列或距上次 flush 超過 flush_seconds 秒才寫到磁碟並 fsync。
+    檔案原本是空的（或不存在）時，第一次寫入會附上欄位標題。
+    """
+
+    def __init__(self, path, flush_rows=500, flush_seconds=5.0, buffer_size=1 << 20):
+        self.path = path
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.file = open(path, "a", encoding="utf-8-sig", newline="", buffering=buffer_size)
+        self.header = self.file.tell() == 0
+        self.unflushed = 0
+        self.last_flush = time.monotonic()
+
+    def write(self, frame):
+        self.file.write(frame.to_csv(index=False, header=self.header))
+        self.header = False
+        self.unflushed += len(frame)
+        if self.unflushed >= self.flush_rows or time.monotonic() - self.last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unflushed = 0
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
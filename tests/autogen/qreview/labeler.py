@@ -0,0 +1,148 @@
+import os
+import argparse
+from collections import namedtuple
+from dotenv import load_dotenv
+from google import genai
+
+from lib.llmCache import LLMCache
+from lib.llmRunner import RateLimiter, DEFAULT_RPM
+from batching import AdaptiveBatcher, response_config, format_rows, parse_rows, run_batches
+from checkpoint import Checkpoint, labelled_frame, restore_output
+from csvstream import read_chunks, CsvOutput
+
+DEFAULT_MODEL = "gemini-2.0-flash"
+
+# 評分規則：
+#   name     CLI 名稱（用於說明文字）
+#   items    評分項目清單，也是輸出 CSV 新增的欄位
+#   prompt   提示範本，{items} 代入評分項目、{count} 代入本批筆數
+#   columns  要送給模型的輸入欄位清單，或 columns(chunk) 依第一段資料決定欄位的函式
+#   model    使用的 Gemini 模型
+#   prelabel 選用的本地判定 prelabel(text) -> preclassify.Prelabel 或 None，明顯的列不必呼叫模型
+Rubric = namedtuple("Rubric", ["name", "items", "prompt", "columns", "model", "prelabel"],
+                    defaults=[DEFAULT_MODEL, None])
+
+def prompt_template(intro):
+    """
+    以 intro 開頭、要求模型回傳帶 id 的 JSON 陣列的標準提示範本。
+    """
+    return (
+        intro + "\n{items}"
+        "\n\n請依據評估結果，對每個項目：若觸及則標記為 \"1\"，否則為空字串。"
+        " 每一行是一筆帶有 id 的輸入，請為每一筆回傳一個物件並保留相同的 id，"
+        "共 {count} 筆，整體回傳為 JSON 陣列。"
+    )
+
+class BatchLabeler:
+    """
+    依 Rubric 以 Gemini 批次標記 CSV 的共用流程：
+    分段讀取輸入、依 token 調整批次大小、磁碟快取、共用速率限制的並行呼叫、
+    檢查點與依原始列順序寫出結果。
+    """
+
+    def __init__(self, rubric, client, cache=None, limiter=None, workers=1):
+        self.rubric = rubric
+        self.client = client
+        self.cache = cache or LLMCache()
+        self.workers = workers
+        self.config = response_config(rubric.items)
+        self.batcher = AdaptiveBatcher(self.label_batch, self.empty_result,
+                                       limiter or RateLimiter(rpm=DEFAULT_RPM or 60),
+                                       prelabel=rubric.prelabel)
+        self.columns = None
+
+    def empty_result(self):
+        return {item: "" for item in self.rubric.items}
+
+    def select_columns(self, chunk):
+        if self.columns is None:
+            columns = self.rubric.columns
+            self.columns = list(columns(chunk) if callable(columns) else columns)
+            print(f"使用欄位作為：{', '.join(self.columns)}")
+        return self.columns
+
+    def texts(self, chunk):
+        """
+        把每一列的輸入欄位合併成送給模型的文字（多個欄位以逗號分隔）。
+        """
+        values = zip(*(chunk[col].tolist() for col in self.select_columns(chunk)))
+        return [",".join(str(value).strip() for value in row) for row in values]
+
+    def label_batch(self, texts):
+        """
+        將多筆輸入合併成一個批次請求，每筆帶有 id（從 1 開始）。
+        以 JSON response schema 要求模型回傳 JSON 陣列，整批只解析一次並依 id 對回各列。
+        回傳與輸入等長的清單，模型漏掉的 id 位置為 None，由 AdaptiveBatcher 只重送這些列。
+        API 錯誤直接拋出，由 AdaptiveBatcher 負責重試。
+        """
+        prompt = self.rubric.prompt.format(items="\n".join(self.rubric.items), count=len(texts))
+        content = prompt + "\n\n" + format_rows(texts)
+
+        response_text = self.cache.generate(self.client, self.rubric.model, content, self.config)
+
+        print("批次 API 回傳內容：", response_text)
+        return parse_rows(response_text, len(texts), self.rubric.items)
+
+    def run(self, input_csv, output_csv, resume=False):
+        """
+        標記 input_csv 並寫入 output_csv，檢查點存於 <output_csv 主檔名>.checkpoint。
+        resume 為 True 時跳過檢查點中已完成的批次。
+        """
+        items = self.rubric.items
+        checkpoint = Checkpoint(os.path.splitext(output_csv)[0] + ".checkpoint", input_csv)
+        if resume and checkpoint.load():
+            start_idx = restore_output(input_csv, checkpoint, items, output_csv)
+            print(f"從檢查點繼續：已完成 {start_idx} 筆")
+        else:
+            if os.path.exists(output_csv):
+                os.remove(output_csv)
+            checkpoint.reset()
+            start_idx = 0
+
+        # 分段讀取輸入；批次完成（可能亂序）就寫入檢查點，輸出 CSV 依原始列順序寫入同一個檔案
+        offset = 0
+        with CsvOutput(output_csv) as output:
+            for chunk in read_chunks(input_csv):
+                chunk_end = offset + len(chunk)
+                if chunk_end <= start_idx:
+                    offset = chunk_end
+                    continue
+                record = lambda s, e, r, base=offset: checkpoint.record(base + s, base + e, r)
+                completed = checkpoint.completed_in(offset, len(chunk))
+                batches = run_batches(self.batcher, self.texts(chunk), max(start_idx - offset, 0),
+                                      self.workers, completed, record)
+                for batch_start, batch_end, batch_results in batches:
+                    output.write(labelled_frame(chunk.iloc[batch_start:batch_end], batch_results, items))
+                print(f"已處理 {chunk_end} 筆")
+                offset = chunk_end
+
+    def report(self):
+        self.batcher.report()
+        self.cache.report()
+
+def run_cli(rubric):
+    """
+    標記 CLI：python <script>.py <path_to_csv> [--resume] [--workers N]，
+    結果寫入目前目錄下的 <輸入檔名>_processed.csv。
+    """
+    parser = argparse.ArgumentParser(description=f"{rubric.name}：以 Gemini 批次標記 CSV")
+    parser.add_argument("input_csv", help="輸入 CSV 路徑")
+    parser.add_argument("--resume", action="store_true", help="依檢查點跳過已完成的批次")
+    parser.add_argument("--workers", type=int, default=1, help="同時送出的批次數（共用同一個速率限制）")
+    args = parser.parse_args()
+
+    # Extract the file name without extension to generate output file name
+    file_root, _ = os.path.splitext(os.path.basename(args.input_csv))
+    output_csv = f"{file_root}_processed.csv"
+
+    # 載入 .env 中的 GEMINI_API_KEY
+    load_dotenv()
+    gemini_api_key = os.environ.get("GEMINI_API_KEY")
+    if not gemini_api_key:
+        raise ValueError("請設定環境變數 GEMINI_API_KEY")
+    client = genai.Client(api_key=gemini_api_key)
+
+    labeler = BatchLabeler(rubric, client, workers=args.workers)
+    labeler.run(args.input_csv, output_csv, resume=args.resume)
+    labeler.report()
+    print("全部處理完成。最終結果已寫入：", output_csv)
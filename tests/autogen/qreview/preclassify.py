@@ -0,0 +1,67 @@
+import re
+from collections import namedtuple
+
+# 本地判定結果：labels 為已確定的項目，complete 為 True 時整列不必再送給模型
+Prelabel = namedtuple("Prelabel", ["labels", "complete"])
+
+# 常見的簡體專用字，只用來判斷是否出現簡體字。
+# 繁體（含台灣、香港慣用異體字）中也合法的字一律不收，例如「干」「后」「污」「夸」「没」「强」「黄」，
+# 避免把正常的繁體文字判成簡體字
+SIMPLIFIED_CHARS = frozenset(
+    "们这说时对发过来经开关问题见长门马鸟鱼车东书买卖头实现爱样机让认识语话读写边岁乐习电脑页给红绿线组织"
+    "结练级纪约终统专业为义乡产亲仅优伤传侠侣债倾兴养农冻凤击刘则刚创剂剑剧劝办务动励劲劳势区华协单卢卫厅"
+    "历压厌县双变吓吗员响团园围图圆场块坚坝坟坠垒垫壮声壳壶处备夹夺奋奖妆妇妈娄娱婴孙学宠审宪宾寻导寿尘"
+    "尝层属屿岂岗岛峡币帅师帐带庆库应庙废张弯弹归彻忆忧怀态总恋恳恶恼悬惊惧惨惯戏战执扩扫扬扰抚抢护报拟拥"
+    "拦择挤挥损换掷摄摆摊敌敛数斋断旧显晒晓晕暂杀杂权条杨枪标栏树桥梦检楼欢欧残毕毙汇汉汤沟沥沦沪泼泽浅浆"
+    "浇测济浏浑浓涛涝涡涤润涨涩渐渔渗湾湿溃满滤滥滩灭灵炉炼烂烛烦烧热爷牵犹狮独狱献环玛疗疯瘫癫盏盐监盘矫"
+    "矿码砖础碍积稳穷窃窍窝竞笔笼筛签简类粮紧纠纤纯纱纲纳纵纷纸纹纺纽细绍绑绕绘络绝绢绣继绩绪续绳维绵综"
+    "缓编缘缝缠缩缴罗罚罢职联聪肃肠肤肾肿胀胁胶脏脸腾舰舱艰艳艺节茎荡荣莱莲获莹营萧萨蓝虑虽虾蚀蚁蚂蛮蝇衔"
+    "补衬袄袭观规觅视览觉触计订讨训议讯记讲讶许论讽设访诀证评诈诉诊词译试诗诚诞询该详误诱请诸诺课谁调谈谊"
+    "谋谎谐谓谜谢谣谦谨谱贝贞负贡财责贤败账货质贩贪贫购贯贱贴贵贷贸费贺贼贾资赌赏赔赖赚赛赞赠赢赵趋跃践轨"
+    "轩转轮软轰轻载较辅辆辈辉输辞辩辽迁迈运还进远违连迟选递遗邓邮邻郑酱酿释鉴针钉钓钟钢钥钦钩钱钻铁铃铅铜"
+    "铝铭银铺链销锁锅锋错锡锦键锯镇镜闪闭闯闲间闷闹闻阀阁阅阔队阳阴阵阶际陆陈险随隐难雾韩顶项顺须顾顿颁颂"
+    "预领频颗颜额风飘飞饥饭饮饰饱饲饺饼饿馆驱驶驻驾验骑骗骚骤鲜鲸鸡鸣鸭鸽鹅鹰麦齐齿龄龙龟"
+)
+
+def has_simplified(text):
+    return any(ch in SIMPLIFIED_CHARS for ch in str(text))
+
+class KeywordTrie:
+    """
+    以字元 trie 比對多個關鍵字：從每個位置沿 trie 往下走，不必對每個關鍵字各掃一次文字。
+    """
+
+    END = object()
+
+    def __init__(self, words):
+        self.root = {}
+        for word in words:
+            node = self.root
+            for ch in word:
+                node = node.setdefault(ch, {})
+            node[self.END] = word
+
+    def find(self, text):
+        """
+        回傳 text 中第一個出現的關鍵字，沒有則回傳 None。
+        """
+        text = str(text)
+        for start in range(len(text)):
+            node = self.root
+            for ch in text[start:]:
+                node = node.get(ch)
+                if node is None:
+                    break
+                if self.END in node:
+                    return node[self.END]
+        return None
+
+# 括號內的動作註記，例如「嗯( 寶寶手指書)」
+ANNOTATION = re.compile(r"[(（].*?[)）]")
+PUNCTUATION = re.compile(r"[\s，。、！？!?,.~～…]+")
+
+def strip_punctuation(text):
+    return PUNCTUATION.sub("", str(text))
+
+def is_blank(text):
+    return strip_punctuation(text).lower() in ("", "nan")
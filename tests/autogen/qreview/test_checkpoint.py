@@ -0,0 +1,81 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+import pandas as pd
+import checkpoint as checkpoint_module
+from batching import AdaptiveBatcher, run_batches
+from checkpoint import Checkpoint, restore_output
+from csvstream import read_chunks
+
+class FlakyLabeler:
+    """
+    前 ok_calls 次呼叫正常回傳，之後一律拋出配額錯誤。
+    """
+
+    def __init__(self, ok_calls=None):
+        self.ok_calls = ok_calls
+        self.sent = []
+
+    def __call__(self, texts):
+        if self.ok_calls is not None and len(self.sent) >= self.ok_calls:
+            raise RuntimeError("429 RESOURCE_EXHAUSTED")
+        self.sent.append(list(texts))
+        return [{"label": text} for text in texts]
+
+def make_batcher(label_fn):
+    return AdaptiveBatcher(label_fn, lambda: {"label": ""}, start_size=4, max_size=4,
+                           max_retries=1, retry_delay=0)
+
+def run(batcher, texts, checkpoint, start=0):
+    completed = checkpoint.completed_in(0, len(texts))
+    batches = run_batches(batcher, texts, start, 1, completed, checkpoint.record)
+    return [label for _, _, labels in batches for label in labels]
+
+def test_failed_rows_are_not_recorded_and_resume_sends_them_again(tmp_path):
+    source = tmp_path / "input.csv"
+    source.write_text("text\n" + "\n".join(f"row{i}" for i in range(20)) + "\n", encoding="utf-8")
+    texts = [f"row{i}" for i in range(20)]
+    path = str(tmp_path / "input.checkpoint")
+
+    checkpoint = Checkpoint(path, str(source))
+    checkpoint.reset()
+    results = run(make_batcher(FlakyLabeler(ok_calls=2)), texts, checkpoint)
+    assert results[:8] == [{"label": text} for text in texts[:8]]
+    assert results[8:] == [None] * 12
+
+    resumed = Checkpoint(path, str(source))
+    assert resumed.load()
+    assert resumed.resume_point() == 8
+
+    labeler = FlakyLabeler()
+    results = run(make_batcher(labeler), texts, resumed, start=resumed.resume_point())
+    assert results == [{"label": text} for text in texts[8:]]
+    assert sum(len(batch) for batch in labeler.sent) == 12
+
+def test_resume_rebuilds_output_range_by_range(tmp_path, monkeypatch):
+    source = tmp_path / "input.csv"
+    texts = [f"row{i}" for i in range(20)]
+    source.write_text("text\n" + "\n".join(texts) + "\n", encoding="utf-8")
+    path = str(tmp_path / "input.checkpoint")
+    checkpoint = Checkpoint(path, str(source))
+    checkpoint.reset()
+    for start in range(0, 12, 4):
+        checkpoint.record(start, start + 4, [{"label": text} for text in texts[start:start + 4]])
+    # 中斷時寫到一半的最後一行
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"start": 12, "end": 16, "lab')
+
+    resumed = Checkpoint(path, str(source))
+    assert resumed.load()
+    assert all(isinstance(position, int) for _, position in resumed.ranges.values())
+    with open(path, encoding="utf-8") as f:
+        assert f.read().endswith("\n")
+
+    # 輸入分段與批次範圍不對齊
+    monkeypatch.setattr(checkpoint_module, "read_chunks", lambda path: read_chunks(path, chunksize=3))
+    output_csv = str(tmp_path / "input_processed.csv")
+    assert restore_output(str(source), resumed, ["label"], output_csv) == 12
+    output = pd.read_csv(output_csv, encoding="utf-8-sig")
+    assert output["text"].tolist() == texts[:12]
+    assert output["label"].tolist() == texts[:12]
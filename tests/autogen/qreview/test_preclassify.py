@@ -0,0 +1,10 @@
+from preclassify import has_simplified
+
+def test_traditional_text_is_not_simplified():
+    for text in ["空氣污染", "夸克", "眼淚", "脈搏", "灑水", "種子", "搔癢", "蘋果", "沒有", "堅強", "黃色",
+                 "臭豆腐,狗屎", "低音長號,低音號", "輔導老師,班導師", "宋雨綺,葉舒華"]:
+        assert not has_simplified(text), text
+
+def test_simplified_text_is_detected():
+    for text in ["电脑", "这个问题", "飞机", "学习"]:
+        assert has_simplified(text), text
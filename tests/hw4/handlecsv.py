@@ -1,4 +1,5 @@
 import os
+import sys
 from datetime import datetime
 import pandas as pd
 from dotenv import load_dotenv
@@ -6,6 +7,10 @@ from google import genai
 from jinja2 import Template
 import pdfkit
 
+# 讓此腳本可以使用專案根目錄的 lib
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from lib.llmRunner import RateLimiter, run_blocks, estimate_tokens, DEFAULT_CONCURRENCY
+
 listfilename = "list.csv"
 
 # 載入環境變數並設定 API 金鑰
@@ -13,6 +18,9 @@ load_dotenv()
 api_key = os.getenv("GEMINI_API_KEY")
 client = genai.Client(api_key=api_key)
 
+# 同時送出的區塊數與速率限制（GEMINI_CONCURRENCY / GEMINI_RPM / GEMINI_TPM）
+limiter = RateLimiter()
+
 # 定義 HTML 模板
 html_template = """
 <!DOCTYPE html>
@@ -105,7 +113,7 @@ def gradio_handler(user_prompt):
         total_rows = df.shape[0]
         block_size = 20
         cumulative_response = ""
-        block_responses = []
+        prompts = []
         # 依區塊處理 CSV 並依每區塊呼叫 LLM 產生報表分析結果
         for i in range(0, total_rows, block_size):
             block = df.iloc[i:i+block_size]
@@ -114,13 +122,26 @@ def gradio_handler(user_prompt):
                       f"{block_csv}\n\n請根據以下規則進行分析並產出報表：\n{user_prompt}")
             print("完整 prompt for block:")
             print(prompt)
+            prompts.append(prompt)
+
+        def call_model(prompt):
             response = client.models.generate_content(
                 model="gemini-2.5-pro-exp-03-25",
                 contents=[prompt]
             )
-            block_response = response.text.strip()
-            cumulative_response += f"區塊 {i//block_size+1}:\n{block_response}\n\n"
-            block_responses.append(cumulative_response)
+            return response.text.strip()
+
+        def on_done(index, block_response, error, seconds):
+            print(f"區塊 {index+1} 完成，耗時 {seconds:.1f} 秒" + (f"，錯誤：{error}" if error else ""))
+
+        # 多個區塊同時送出，結果仍依區塊順序合併
+        results = run_blocks(call_model, prompts, max_workers=DEFAULT_CONCURRENCY, limiter=limiter,
+                             tokens=estimate_tokens, on_done=on_done)
+        for index, (block_response, error, seconds) in enumerate(results):
+            if error:
+                cumulative_response += f"區塊 {index+1} 失敗：{error}\n\n"
+            else:
+                cumulative_response += f"區塊 {index+1}:\n{block_response}\n\n"
             # 可考慮 yield 逐步更新（此處示範最終一次回傳）
         # 將所有區塊回應合併，並生成漂亮表格 PDF
         pdf_path = generate_pdf(text=cumulative_response)
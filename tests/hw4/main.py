@@ -1,7 +1,6 @@
 import gradio as gr
 from dotenv import load_dotenv
 from scrape import scrapeComments
-from tocsv import tocsv
 from handlecsv import gradio_handler
 
 # 讀取 .env 檔案
@@ -9,10 +8,9 @@ load_dotenv()
 
 # HW4
 
-# 爬取評論資料、轉換成CSV檔案
+# 爬取評論資料，直接寫入CSV檔案
 def getCsv(goodCode):
     scrapeComments(goodCode)
-    tocsv()
 
 # 標記評論後生成PDF報告
 def report_handler(user_prompt):
@@ -1,10 +1,19 @@
+import os
+import sys
 from playwright.sync_api import sync_playwright
 
+# 讓此腳本可以使用專案根目錄的 lib
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from lib.browserProfile import launch_chromium, block_page_requests, report_playwright_usage
+from lib.momoReviews import ReviewWriter, extract_reviews
+
 def scrapeComments(code):
   # 爬取商品評價資訊
   with sync_playwright() as p:
-    browser = p.chromium.launch(headless=False)  # 顯示瀏覽器
+    # 預設為無頭模式並擋掉圖片、字型與追蹤器；BROWSER_PROFILE=debug 時顯示瀏覽器
+    browser = launch_chromium(p)
     page = browser.new_page()
+    block_page_requests(page)
 
     print(f"啟動瀏覽器，進入商品頁面 {code}...")
 
@@ -20,10 +29,6 @@ def scrapeComments(code):
 
     page.wait_for_timeout(1000)
 
-    # 清空檔案內容
-    with open("list.txt", "w", encoding="utf-8") as file:
-        file.write("")
-
     # Use query_selector_all to select multiple elements
     page_switcher_elements = page.query_selector_all("div.pageArea ul li")
 
@@ -33,17 +38,17 @@ def scrapeComments(code):
         print(f"Element {index}: {element.inner_text()}")  # Example: print the inner text of each element
         page_count += 1
 
-    # 印出每個 'li' 中第二個 'div' 的文字
-    with open("list.txt", "a", encoding="utf-8") as file:
+    # 直接從頁面解析評論並逐頁寫入 list.csv，不再經過 list.txt
+    with ReviewWriter("list.csv") as writer:
         for i in range(page_count):
-            li_elements = page.query_selector_all(".reviewCardInner")
-            for index, li in enumerate(li_elements):
-                file.write(li.inner_text() + "\n---\n")
-                print(li.inner_text())  # 打印第二個 div 的文字
+            rows = extract_reviews(page)
+            writer.write_rows(rows)
+            print(f"第 {i+1} 頁：{len(rows)} 筆評論")
             if i != (page_count - 1):
                 nextBtn = page.query_selector(f"dd[pageidx='{i+2}']")
                 nextBtn.click()
                 page.wait_for_timeout(1000)
+        print(f"共寫入 {writer.count} 筆評論至 list.csv")
 
 
 
@@ -51,6 +56,7 @@ def scrapeComments(code):
     #input("瀏覽器保持開啟，按 Enter 關閉...")
 
     # 關閉瀏覽器
+    report_playwright_usage()
     browser.close()
     print("瀏覽器已關閉")
 
@@ -1,14 +1,26 @@
 import os
-import csv
+import sys
+import atexit
+import threading
+from collections import Counter
 from datetime import datetime
 import pandas as pd
 from flask import Flask, request, render_template, send_from_directory, jsonify, url_for
-from playwright.sync_api import sync_playwright
 from dotenv import load_dotenv
 from google import genai
 from jinja2 import Template
 import pdfkit
 
+# Make the project-level lib importable
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from lib.momoReviews import REVIEW_SELECTOR, ReviewWriter, extract_reviews
+from lib.llmRunner import RateLimiter, run_blocks, estimate_tokens, DEFAULT_CONCURRENCY
+from lib.llmCache import LLMCache
+from lib.reviewDedup import dedup_reviews, COUNT_COLUMN, RATINGS_COLUMN, DEFAULT_THRESHOLD as DEDUP_THRESHOLD
+from browserpool import BrowserPool
+from jobqueue import JobQueue
+from workspace import Workspace, is_valid_code, is_valid_job_id, product_csv, report_pdf, cleanup_workspaces
+
 # --- Configuration ---
 load_dotenv()
 api_key = os.getenv("GEMINI_API_KEY")
@@ -27,6 +39,12 @@ else:
     print("GEMINI_API_KEY not found in environment variables.")
     # Handle missing API key (client remains None)
 
+# Gemini calls from every request share one rate limiter (GEMINI_RPM / GEMINI_TPM)
+GEMINI_CONCURRENCY = DEFAULT_CONCURRENCY # Max blocks in flight per report (GEMINI_CONCURRENCY)
+gemini_limiter = RateLimiter()
+# Identical (model, prompt) pairs are answered from the on-disk cache (LLM_CACHE_PATH / _TTL / _MAX_MB)
+llm_cache = LLMCache()
+
 # Ensure wkhtmltopdf is installed and optionally configure path
 # Example for Windows, adjust as necessary:
 # config = pdfkit.configuration(wkhtmltopdf='C:\\Program Files\\wkhtmltopdf\\bin\\wkhtmltopdf.exe')
@@ -34,141 +52,240 @@ else:
 
 # Define file paths relative to this app's directory
 APP_ROOT = os.path.dirname(os.path.abspath(__file__))
-RAW_COMMENTS_FILE = os.path.join(APP_ROOT, "list.txt")
-CSV_COMMENTS_FILE = os.path.join(APP_ROOT, "list.csv")
-HTML_OUTPUT_FILE = os.path.join(APP_ROOT, "output.html")
-PDF_OUTPUT_DIR = os.path.join(APP_ROOT, "reports") # Directory to store generated PDFs
+WORKSPACE_ROOT = os.path.join(APP_ROOT, "workspaces") # Per-product, per-job CSV / HTML / PDF
+WORKSPACE_TTL = int(os.getenv("WORKSPACE_TTL", str(24 * 3600))) # Seconds to keep a finished job's files
+WORKSPACE_MAX_PRODUCTS = int(os.getenv("WORKSPACE_MAX_PRODUCTS", "50")) # Most recently used products kept on disk
 
-# Ensure PDF output directory exists
-os.makedirs(PDF_OUTPUT_DIR, exist_ok=True)
+# Ensure output directories exist
+os.makedirs(WORKSPACE_ROOT, exist_ok=True)
 
 app = Flask(__name__)
 
-# --- Helper Functions (Adapted from hw4) ---
+# Scrape/report work runs in the background; requests only enqueue it.
+# Every job writes into its own workspace, so jobs can run concurrently.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+job_queue = JobQueue(workers=JOB_WORKERS)
+
+active_workspaces = set()
+# Products with queued or running jobs: their published list.csv must survive LRU eviction
+product_jobs = Counter()
+workspace_lock = threading.Lock()
+
+def open_workspace(code, job_id):
+    """Creates the job's workspace and protects it from cleanup while the job runs."""
+    with workspace_lock:
+        workspace = Workspace(WORKSPACE_ROOT, code, job_id)
+        active_workspaces.add(workspace.path)
+        return workspace
+
+def close_workspace(workspace):
+    with workspace_lock:
+        active_workspaces.discard(workspace.path)
+
+def release_product(code):
+    with workspace_lock:
+        product_jobs[code] -= 1
+        if product_jobs[code] <= 0:
+            del product_jobs[code]
+
+def submit_product_job(kind, fn, code, *args):
+    """Queues fn(job, code, *args) and protects the product from eviction from now until the job finishes."""
+    with workspace_lock:
+        product_jobs[code] += 1
+
+    def run(job, *args):
+        try:
+            return fn(job, *args)
+        finally:
+            release_product(code)
 
-def scrapeComments(code):
-    """Scrapes comments for a given product code using Playwright."""
-    print(f"Starting scrape for product code: {code}")
     try:
-        with sync_playwright() as p:
-            # Consider adding browser launch options if needed (e.g., proxy)
-            browser = p.chromium.launch(headless=True) # Run headless for server environment
-            page = browser.new_page()
-            page.goto(f"https://www.momoshop.com.tw/goods/GoodsDetail.jsp?i_code={code}", timeout=60000) # Increased timeout
-            page.wait_for_timeout(3000) # Allow time for dynamic content
-
-            # Click the comments tab/button
-            commentBtn = page.query_selector(".goodsCommendLi")
-            if not commentBtn:
-                print("Comment button not found.")
-                browser.close()
-                return False
-            commentBtn.click()
-            page.wait_for_timeout(2000) # Wait for comments section to load
-
-            # Clear previous raw comments
-            with open(RAW_COMMENTS_FILE, "w", encoding="utf-8") as file:
-                file.write("")
-
-            page_count = 0
-            try:
-                # Find page switcher elements to determine number of pages
-                page_switcher_elements = page.query_selector_all("div.pageArea ul li")
-                # Filter out non-page number elements if necessary based on structure
-                page_count = len([el for el in page_switcher_elements if el.query_selector('a') and el.inner_text().strip().isdigit()])
-                if page_count == 0 and page.query_selector(".reviewCardInner"): # Handle single page case
-                    page_count = 1
-                print(f"Found {page_count} pages of comments.")
-            except Exception as e:
-                 print(f"Could not determine page count, assuming 1 page. Error: {e}")
-                 page_count = 1 # Default to 1 page if detection fails
-
-
-            # Scrape comments page by page
-            with open(RAW_COMMENTS_FILE, "a", encoding="utf-8") as file:
-                for i in range(page_count):
-                    print(f"Scraping page {i+1}...")
-                    page.wait_for_selector(".reviewCardInner", timeout=10000) # Wait for comments to be present
-                    li_elements = page.query_selector_all(".reviewCardInner")
-                    if not li_elements:
-                         print(f"No comments found on page {i+1}.")
-                         continue # Skip if no comments found
-
-                    for index, li in enumerate(li_elements):
-                        file.write(li.inner_text() + "\n---\n")
-
-                    # Go to next page if not the last page
-                    if i < page_count - 1:
-                        try:
-                            # Find the correct next page link/button
-                            # This selector might need adjustment based on actual site structure
-                            next_page_selector = f"div.pageArea a:has-text('{i+2}')" # Example selector
-                            nextBtn = page.query_selector(next_page_selector)
-                            if nextBtn:
-                                nextBtn.click()
-                                page.wait_for_timeout(2000) # Wait for next page load
-                            else:
-                                print(f"Next page button for page {i+2} not found.")
-                                break # Stop if next page link isn't found
-                        except Exception as e:
-                            print(f"Error navigating to next page: {e}")
-                            break # Stop pagination on error
-            browser.close()
-            print("Scraping finished.")
-            return True
-    except Exception as e:
-        print(f"An error occurred during scraping: {e}")
-        if 'browser' in locals() and browser.is_connected():
-            browser.close()
-        return False
+        return job_queue.submit(kind, run, code, *args)
+    except Exception:
+        release_product(code)
+        raise
+
+def evict_workspaces():
+    """Removes expired job workspaces and the least recently used products without queued or running jobs."""
+    with workspace_lock:
+        cleanup_workspaces(WORKSPACE_ROOT, WORKSPACE_TTL, WORKSPACE_MAX_PRODUCTS,
+                           keep=active_workspaces, keep_products=set(product_jobs))
 
-def tocsv():
-    """Converts raw comments from list.txt to list.csv."""
-    print("Converting raw comments to CSV...")
-    if not os.path.exists(RAW_COMMENTS_FILE):
-        print(f"Error: Raw comments file not found at {RAW_COMMENTS_FILE}")
+# --- Helper Functions (Adapted from hw4) ---
+
+SCRAPE_WORKERS = int(os.getenv("SCRAPE_WORKERS", "4")) # Max parallel browser contexts across all requests
+BROWSER_MAX_USES = int(os.getenv("BROWSER_MAX_USES", "50")) # Recycle each pooled browser after this many jobs
+SCRAPE_TIMEOUT = float(os.getenv("SCRAPE_TIMEOUT", "600")) # Seconds to wait for each pooled scrape job, including time queued
+
+browser_pool = None
+browser_pool_lock = threading.Lock()
+
+def get_browser_pool():
+    """Starts the shared browser pool on first use (not at import, so the debug reloader doesn't launch browsers)."""
+    global browser_pool
+    with browser_pool_lock:
+        if browser_pool is None:
+            browser_pool = BrowserPool(size=SCRAPE_WORKERS, max_uses=BROWSER_MAX_USES)
+            atexit.register(browser_pool.close)
+        return browser_pool
+
+def open_comments(page, code):
+    """Opens the product page and switches to the comments tab. Returns False if there is no tab."""
+    page.goto(f"https://www.momoshop.com.tw/goods/GoodsDetail.jsp?i_code={code}", timeout=60000) # Increased timeout
+    page.wait_for_timeout(3000) # Allow time for dynamic content
+
+    # Click the comments tab/button
+    commentBtn = page.query_selector(".goodsCommendLi")
+    if not commentBtn:
+        print("Comment button not found.")
         return False
+    commentBtn.click()
+    page.wait_for_timeout(2000) # Wait for comments section to load
+    return True
+
+def count_review_pages(page):
+    """Counts the numbered links in the pagination bar."""
+    try:
+        # Find page switcher elements to determine number of pages
+        page_switcher_elements = page.query_selector_all("div.pageArea ul li")
+        # Filter out non-page number elements if necessary based on structure
+        page_numbers = [int(el.inner_text().strip()) for el in page_switcher_elements if el.query_selector('a') and el.inner_text().strip().isdigit()]
+        page_count = max(page_numbers) if page_numbers else 0
+        if page_count == 0 and page.query_selector(REVIEW_SELECTOR): # Handle single page case
+            page_count = 1
+        print(f"Found {page_count} pages of comments.")
+        return page_count
+    except Exception as e:
+        print(f"Could not determine page count, assuming 1 page. Error: {e}")
+        return 1 # Default to 1 page if detection fails
+
+def read_review_page(page):
+    """Returns every review on the current page as a structured row, read straight from the DOM."""
+    page.wait_for_selector(REVIEW_SELECTOR, timeout=10000) # Wait for comments to be present
+    return extract_reviews(page)
+
+def goto_review_page(page, current, target):
+    """
+    Clicks through the pagination bar from page `current` to page `target`.
+    Jumps to the furthest visible page number that does not overshoot, so pages
+    outside the visible window are reached in a few clicks.
+    """
+    while current < target:
+        links = page.query_selector_all("div.pageArea a")
+        candidates = {}
+        for link in links:
+            text = link.inner_text().strip()
+            if text.isdigit() and current < int(text) <= target:
+                candidates[int(text)] = link
+        if not candidates:
+            print(f"Page button for page {target} not found (currently on page {current}).")
+            return current
+        next_page = max(candidates)
+        first_review = page.query_selector(REVIEW_SELECTOR)
+        previous_text = first_review.inner_text() if first_review else ""
+        candidates[next_page].click()
+        # Wait until the review list actually changes instead of sleeping a fixed time
+        page.wait_for_function(
+            """([selector, previous]) => {
+                const card = document.querySelector(selector);
+                return card && card.innerText !== previous;
+            }""",
+            arg=[REVIEW_SELECTOR, previous_text],
+            timeout=10000
+        )
+        current = next_page
+    return current
+
+def scrape_page_range(page, first, last):
+    """Scrapes review pages first..last (1-based, inclusive) on an already opened comments tab."""
+    results = {}
+    current = 1
+    for page_number in range(first, last + 1):
+        try:
+            current = goto_review_page(page, current, page_number)
+            if current != page_number:
+                break # Stop if the page link isn't reachable
+            print(f"Scraping page {page_number}...")
+            results[page_number] = read_review_page(page)
+        except Exception as e:
+            print(f"Error scraping page {page_number}: {e}")
+            break # Stop pagination on error
+    return results
+
+def scrape_first_page(context, code):
+    """Pool job: opens the comments tab, counts the pages and scrapes page 1."""
+    page = context.new_page()
+    if not open_comments(page, code):
+        return None, {}
+    page_count = count_review_pages(page)
+    if page_count == 0:
+        return 0, {}
+    return page_count, scrape_page_range(page, 1, 1)
+
+def scrape_page_range_job(context, code, first, last):
+    """Pool job: scrapes review pages first..last in its own context."""
+    page = context.new_page()
+    if not open_comments(page, code):
+        return {}
+    return scrape_page_range(page, first, last)
+
+def split_pages(first, last, workers):
+    """Splits pages first..last into at most `workers` contiguous (first, last) ranges."""
+    page_count = last - first + 1
+    if page_count <= 0:
+        return []
+    workers = max(1, min(workers, page_count))
+    size, extra = divmod(page_count, workers)
+    ranges = []
+    for i in range(workers):
+        end = first + size - 1 + (1 if i < extra else 0)
+        ranges.append((first, end))
+        first = end + 1
+    return ranges
+
+def scrapeComments(code, csv_file, workers=SCRAPE_WORKERS):
+    """
+    Scrapes comments for a given product code on the shared browser pool.
+    The page count is discovered once together with page 1; the remaining pages are
+    split into contiguous ranges scraped concurrently in isolated contexts.
+    Reviews are written to the CSV as soon as every earlier page is in, so rows stay in page order.
+    """
+    print(f"Starting scrape for product code: {code}")
     try:
-        with open(RAW_COMMENTS_FILE, "r", encoding="utf-8") as f:
-            content = f.read()
-
-        blocks = content.strip().split('---\n')
-        data = []
-
-        for block in blocks:
-            lines = block.strip().split('\n')
-            if not lines or not lines[0]: # Skip empty blocks
-                continue
-
-            # Initialize fields with defaults
-            user, spec, date, rating, comment = "N/A", "N/A", "N/A", "N/A", ""
-
-            # Basic parsing logic (might need refinement based on actual data variations)
-            user = lines[0].strip('*').strip()
-            if len(lines) > 2 and "規格" in lines[2]:
-                 spec = lines[2].replace("規格 : ", "").strip()
-            if len(lines) > 3:
-                 date = lines[3].strip() # Assuming date is usually 4th line
-            if len(lines) > 4 and "評等" in lines[4]: # Check if rating exists
-                 rating = lines[4].strip()
-                 comment = ''.join(lines[5:]).strip()
-            elif len(lines) > 4: # If no rating, assume comment starts earlier
-                 comment = ''.join(lines[4:]).strip()
-            else: # Handle very short comments
-                 comment = ""
-
-
-            data.append([user, spec, date, rating, comment])
-
-        with open(CSV_COMMENTS_FILE, "w", newline='', encoding="utf-8-sig") as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(["使用者", "規格", "日期", "評分", "留言內容"])
-            writer.writerows(data)
-
-        print(f"Conversion complete! Output: {CSV_COMMENTS_FILE}")
+        pool = get_browser_pool()
+        page_count, pages = pool.run(lambda context: scrape_first_page(context, code), timeout=SCRAPE_TIMEOUT)
+        if page_count is None:
+            return False
+
+        futures = [
+            pool.submit(lambda context, first=first, last=last: scrape_page_range_job(context, code, first, last))
+            for first, last in split_pages(2, page_count, workers)
+        ]
+        with ReviewWriter(csv_file) as writer:
+            for page_number in sorted(pages):
+                writer.write_rows(pages[page_number])
+            # Ranges are contiguous and submitted in order, so waiting on them in order keeps rows sorted
+            for future in futures:
+                try:
+                    scraped = future.result(timeout=SCRAPE_TIMEOUT)
+                except Exception as e:
+                    # Drops the range if it is still queued; its pages are reported as not scraped
+                    future.cancel()
+                    print(f"Error in page worker: {e!r}")
+                    continue
+                for page_number in sorted(scraped):
+                    writer.write_rows(scraped[page_number])
+                pages.update(scraped)
+            print(f"Saved {writer.count} reviews to {csv_file}")
+        pool.report_usage()
+
+        missing = [n for n in range(1, page_count + 1) if n not in pages]
+        if missing:
+            print(f"Pages not scraped: {missing}")
+        print("Scraping finished.")
         return True
     except Exception as e:
-        print(f"An error occurred during CSV conversion: {e}")
+        print(f"An error occurred during scraping: {e}")
         return False
 
 # --- PDF Generation and AI Analysis (Adapted from handlecsv.py) ---
@@ -245,8 +362,8 @@ def parse_markdown_table(markdown_text: str) -> pd.DataFrame:
         return None
 
 
-def generate_pdf_report(text_content: str = None) -> str:
-    """Generates PDF report from text, attempting to parse Markdown tables."""
+def generate_pdf_report(html_file: str, pdf_file: str, text_content: str = None) -> str:
+    """Generates PDF report from text into `pdf_file`, attempting to parse Markdown tables."""
     print("Generating PDF report...")
     html_table = None
     final_text_content = text_content if text_content else "No content provided."
@@ -266,88 +383,133 @@ def generate_pdf_report(text_content: str = None) -> str:
     html_content = html_template.render(table=html_table, text_content=final_text_content)
 
     # Save intermediate HTML (optional, for debugging)
-    with open(HTML_OUTPUT_FILE, "w", encoding="utf-8") as file:
+    with open(html_file, "w", encoding="utf-8") as file:
         file.write(html_content)
-    print(f"Intermediate HTML saved to: {HTML_OUTPUT_FILE}")
-
-    # Generate PDF filename
-    pdf_filename = f"report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-    pdf_filepath = os.path.join(PDF_OUTPUT_DIR, pdf_filename)
+    print(f"Intermediate HTML saved to: {html_file}")
 
     try:
         # Specify configuration if needed, especially on Windows or if wkhtmltopdf is not in PATH
-        # pdfkit.from_file(HTML_OUTPUT_FILE, pdf_filepath, configuration=config, options={"enable-local-file-access": ""})
-        pdfkit.from_file(HTML_OUTPUT_FILE, pdf_filepath, options={"enable-local-file-access": ""}) # Use empty string value
-        print(f"PDF report generated successfully: {pdf_filepath}")
-        return pdf_filename # Return only the filename for the download route
+        # pdfkit.from_file(html_file, pdf_file, configuration=config, options={"enable-local-file-access": ""})
+        pdfkit.from_file(html_file, pdf_file, options={"enable-local-file-access": ""}) # Use empty string value
+        print(f"PDF report generated successfully: {pdf_file}")
+        return pdf_file
     except Exception as e:
         print(f"Error generating PDF: {e}")
         # Consider how to report this error back to the user
         return None
 
 
-def analyze_comments_with_ai(user_prompt: str):
-    """Analyzes comments from CSV using GenAI and generates PDF."""
+def analyze_comments_with_ai(user_prompt: str, csv_file: str, workspace: Workspace, progress=None):
+    """
+    Analyzes comments from CSV using GenAI and generates PDF.
+    `progress(block_number, total_blocks, status, seconds)` is called as each block starts and finishes.
+    """
     print("Starting AI analysis...")
     # Check if the client was initialized successfully
     if not client:
         return "Error: GenAI Client not initialized. Check API Key and configuration.", None
 
-    if not os.path.exists(CSV_COMMENTS_FILE):
+    if not os.path.exists(csv_file):
         return "Error: CSV file not found. Please scrape comments first.", None
 
     try:
-        df = pd.read_csv(CSV_COMMENTS_FILE)
+        df = pd.read_csv(csv_file)
         if df.empty:
             return "CSV file is empty. No comments to analyze.", None
 
+        # Near-duplicate comments are sent once, with a count of how many comments they stand for
+        # and the ratings of the whole cluster (REVIEW_DEDUP_THRESHOLD).
+        # The analysis is free-form text per block, so it covers the representatives; it is not mapped back per comment.
+        comment_count = df.shape[0]
+        dedup_note = ""
+        if "留言內容" in df.columns and DEDUP_THRESHOLD > 0:
+            df = dedup_reviews(df, threshold=DEDUP_THRESHOLD)
+            print(f"Deduplicated {comment_count} comments into {df.shape[0]} representatives")
+            if df.shape[0] < comment_count:
+                dedup_note = f"--- 本報告分析 {comment_count} 則評論中的 {df.shape[0]} 則代表評論（內容相近的評論已合併並計數） ---\n\n"
+
         total_rows = df.shape[0]
+        weight_note = ""
+        if COUNT_COLUMN in df.columns:
+            weight_note = f"「{COUNT_COLUMN}」欄位表示該則評論代表幾則內容相近的評論，統計時請依此加權。\n\n"
+        if RATINGS_COLUMN in df.columns:
+            weight_note += f"「{RATINGS_COLUMN}」欄位列出這些評論各自的評分與次數（例如「5×3」代表三則 5 分），評分統計請使用此欄位。\n\n"
         block_size = 20 # Process in blocks of 20
-        cumulative_response = ""
-
-        print(f"Processing {total_rows} comments in blocks of {block_size}...")
-        # Removed model initialization here, will use client directly
-
+        blocks = []
         for i in range(0, total_rows, block_size):
             block = df.iloc[i:min(i+block_size, total_rows)]
             block_csv = block.to_csv(index=False)
             prompt = (f"以下是CSV格式的商品評論資料第 {i+1} 到 {min(i+block_size, total_rows)} 筆：\n"
                       f"```csv\n{block_csv}\n```\n\n"
+                      f"{weight_note}"
                       f"請根據以下指示分析這些評論：\n{user_prompt}\n\n"
                       f"請將分析結果整理成Markdown表格格式，包含適當的欄位標題。")
+            blocks.append(prompt)
+        total_blocks = len(blocks)
 
-            print(f"Sending prompt for block {i//block_size+1} to AI...")
-            # print(prompt) # Uncomment to debug the exact prompt
+        print(f"Processing {total_rows} comments in {total_blocks} blocks of {block_size}, up to {GEMINI_CONCURRENCY} at a time...")
+        # Removed model initialization here, will use client directly
 
-            try:
-                # Use client.models.generate_content as in the original script
-                # Using the specific model from hw4
-                response = client.models.generate_content(
-                    model="gemini-2.5-pro-exp-03-25", # Use the specific model from hw4
-                    contents=[prompt] # Pass prompt as contents list
-                )
-                # Assuming response structure is similar and .text gives the result
-                block_response = response.text.strip()
-                cumulative_response += f"--- 分析區塊 {i//block_size+1} ---\n{block_response}\n\n"
-            except Exception as ai_error:
-                 print(f"Error calling GenAI for block {i//block_size+1}: {ai_error}")
-                 # Consider adding more specific error details if possible
-                 cumulative_response += f"--- 分析區塊 {i//block_size+1} 失敗：{ai_error} ---\n\n"
+        model = "gemini-2.5-pro-exp-03-25" # Use the specific model from hw4
 
+        def call_model(prompt):
+            # print(prompt) # Uncomment to debug the exact prompt
+            cached = llm_cache.get(model, [prompt])
+            if cached is not None:
+                return cached.strip()
+            # Only real API calls count against the rate limit
+            gemini_limiter.acquire(estimate_tokens(prompt))
+            # Use client.models.generate_content as in the original script
+            response = client.models.generate_content(
+                model=model,
+                contents=[prompt] # Pass prompt as contents list
+            )
+            # Assuming response structure is similar and .text gives the result
+            block_response = response.text.strip()
+            llm_cache.put(model, [prompt], block_response)
+            return block_response
+
+        def on_start(index):
+            print(f"Sending prompt for block {index+1} to AI...")
+            if progress:
+                progress(index+1, total_blocks, "running")
+
+        def on_done(index, block_response, ai_error, seconds):
+            if ai_error:
+                print(f"Error calling GenAI for block {index+1} after {seconds:.1f}s: {ai_error}")
+            else:
+                print(f"Block {index+1} answered in {seconds:.1f}s")
+            if progress:
+                progress(index+1, total_blocks, "error" if ai_error else "done", seconds)
+
+        # Blocks are sent concurrently under the shared rate limit; results come back in block order
+        results = run_blocks(call_model, blocks, max_workers=GEMINI_CONCURRENCY, on_start=on_start, on_done=on_done)
+        cumulative_response = dedup_note
+        for index, (block_response, ai_error, seconds) in enumerate(results):
+            if ai_error:
+                # Consider adding more specific error details if possible
+                cumulative_response += f"--- 分析區塊 {index+1} 失敗：{ai_error} ---\n\n"
+            else:
+                cumulative_response += f"--- 分析區塊 {index+1} ---\n{block_response}\n\n"
+        latencies = [seconds for _, _, seconds in results]
+        if latencies:
+            print(f"Block latency: avg {sum(latencies)/len(latencies):.1f}s, max {max(latencies):.1f}s")
+        llm_cache.report()
 
         print("AI analysis complete.")
         # Generate PDF from the combined responses
-        pdf_filename = generate_pdf_report(text_content=cumulative_response)
+        # The PDF lives in the job's workspace, so workspace TTL / LRU eviction also cleans up reports
+        pdf_file = generate_pdf_report(workspace.html_file, workspace.pdf_file, text_content=cumulative_response)
 
-        if pdf_filename:
-            return cumulative_response, pdf_filename
+        if pdf_file:
+            return cumulative_response, pdf_file
         else:
             return cumulative_response, None # Return text even if PDF fails
 
     except FileNotFoundError:
-        return f"Error: CSV file not found at {CSV_COMMENTS_FILE}.", None
+        return f"Error: CSV file not found at {csv_file}.", None
     except pd.errors.EmptyDataError:
-         return f"Error: CSV file {CSV_COMMENTS_FILE} is empty.", None
+         return f"Error: CSV file {csv_file} is empty.", None
     except Exception as e:
         print(f"An error occurred during AI analysis: {e}")
         return f"An unexpected error occurred during analysis: {e}", None
@@ -360,65 +522,106 @@ def index():
     """Serves the main HTML page."""
     return render_template('index.html')
 
+def run_scrape_job(job, goodCode):
+    """Background job: scrapes a product into the job's workspace and publishes the CSV."""
+    workspace = open_workspace(goodCode, job.id)
+    try:
+        job.set_message("正在爬取評論資料...")
+        if not scrapeComments(goodCode, workspace.csv_file):
+            raise RuntimeError("Scraping failed.")
+        workspace.publish_csv()
+    finally:
+        close_workspace(workspace)
+    message = f"Successfully scraped and saved comments for product {goodCode}."
+    job.set_message(message)
+    return {"message": message, "goodCode": goodCode}
+
+def run_report_job(job, goodCode, user_prompt):
+    """Background job: analyzes the product's latest CSV block by block and renders the PDF."""
+    workspace = open_workspace(goodCode, job.id)
+    try:
+        job.set_message("正在生成分析報告...")
+        analysis_text, pdf_file = analyze_comments_with_ai(
+            user_prompt, product_csv(WORKSPACE_ROOT, goodCode), workspace, progress=job.block_update
+        )
+    finally:
+        close_workspace(workspace)
+    summary = analysis_text[:500] + "..." if len(analysis_text) > 500 else analysis_text # Send a summary
+    if not pdf_file:
+        # Keep the analysis text visible even though the job failed
+        raise RuntimeError(f"AI analysis completed, but PDF generation failed.\n{summary}")
+    job.set_message("Report generated successfully.")
+    pdf_filename = f"report_{goodCode}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    return {"analysis_summary": summary, "pdf_filename": pdf_filename, "code": goodCode, "job_id": job.id}
+
+def accepted(job_id):
+    return jsonify({
+        "status": "accepted",
+        "job_id": job_id,
+        "status_url": url_for('job_status', job_id=job_id)
+    }), 202
+
 @app.route('/scrape', methods=['POST'])
 def scrape_route():
-    """Handles scraping request."""
+    """Queues a scraping job and returns its id immediately."""
     goodCode = request.form.get('goodCode')
     if not goodCode:
         return jsonify({"status": "error", "message": "Product ID is required."}), 400
+    if not is_valid_code(goodCode):
+        return jsonify({"status": "error", "message": "Invalid product ID."}), 400
 
     print(f"Received scrape request for code: {goodCode}")
-    scrape_success = scrapeComments(goodCode)
-    if not scrape_success:
-         return jsonify({"status": "error", "message": "Scraping failed."}), 500
-
-    csv_success = tocsv()
-    if not csv_success:
-        return jsonify({"status": "error", "message": "CSV conversion failed."}), 500
-
-    return jsonify({"status": "success", "message": f"Successfully scraped and saved comments to {CSV_COMMENTS_FILE}."})
+    job_id = submit_product_job("scrape", run_scrape_job, goodCode)
+    evict_workspaces()
+    return accepted(job_id)
 
 
 @app.route('/report', methods=['POST'])
 def report_route():
-    """Handles report generation request."""
+    """Queues a report generation job and returns its id immediately."""
+    goodCode = request.form.get('goodCode')
     user_prompt = request.form.get('user_prompt')
+    if not is_valid_code(goodCode):
+        return jsonify({"status": "error", "message": "A valid product ID is required."}), 400
     if not user_prompt:
         return jsonify({"status": "error", "message": "Analysis prompt is required."}), 400
-
-    print(f"Received report request with prompt: {user_prompt[:100]}...") # Log first 100 chars
-    analysis_text, pdf_filename = analyze_comments_with_ai(user_prompt)
-
-    if pdf_filename:
-        pdf_url = url_for('download_file', filename=pdf_filename, _external=True)
-        return jsonify({
-            "status": "success",
-            "message": "Report generated successfully.",
-            "analysis_summary": analysis_text[:500] + "..." if len(analysis_text) > 500 else analysis_text, # Send a summary
-            "pdf_filename": pdf_filename,
-            "pdf_url": pdf_url
-        })
-    else:
-        # Handle case where PDF generation failed but analysis might have text
-        return jsonify({
-            "status": "error",
-            "message": "AI analysis completed, but PDF generation failed.",
-            "analysis_summary": analysis_text[:500] + "..." if len(analysis_text) > 500 else analysis_text
-         }), 500
-
-
-@app.route('/download/<filename>')
-def download_file(filename):
-    """Serves generated PDF files for download."""
-    print(f"Download request for: {filename}")
-    safe_path = os.path.join(PDF_OUTPUT_DIR, filename)
-    # Basic security check: ensure the path is still within the intended directory
-    if not os.path.abspath(safe_path).startswith(os.path.abspath(PDF_OUTPUT_DIR)):
+    if not os.path.exists(product_csv(WORKSPACE_ROOT, goodCode)):
+        return jsonify({"status": "error", "message": "No scraped comments for this product. Please scrape first."}), 404
+
+    print(f"Received report request for {goodCode} with prompt: {user_prompt[:100]}...") # Log first 100 chars
+    # Queue first so the product is protected before eviction runs
+    job_id = submit_product_job("report", run_report_job, goodCode, user_prompt)
+    evict_workspaces()
+    return accepted(job_id)
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Reports job status, per-block progress and, once done, the result."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Job not found."}), 404
+    data = job.to_dict()
+    result = data["result"] = dict(data["result"] or {})
+    if result.get("pdf_filename"):
+        result["pdf_url"] = url_for('download_file', code=result["code"], job_id=result["job_id"], _external=True)
+    return jsonify(data)
+
+
+@app.route('/download/<code>/<job_id>')
+def download_file(code, job_id):
+    """Serves a report job's PDF from its workspace."""
+    print(f"Download request for: {code}/{job_id}")
+    # Both parts become path components, so only allow the expected formats
+    if not is_valid_code(code) or not is_valid_job_id(job_id):
         return "Forbidden", 403
-    if not os.path.exists(safe_path):
+    pdf_file = report_pdf(WORKSPACE_ROOT, code, job_id)
+    if not os.path.exists(pdf_file):
         return "File not found", 404
-    return send_from_directory(PDF_OUTPUT_DIR, filename, as_attachment=True)
-
+    job = job_queue.get(job_id)
+    download_name = (job.result or {}).get("pdf_filename") if job else None
+    return send_from_directory(os.path.dirname(pdf_file), os.path.basename(pdf_file), as_attachment=True,
+                               download_name=download_name or f"report_{code}_{job_id[:8]}.pdf")
 
 if __name__ == '__main__':
     # Use waitress or gunicorn for production
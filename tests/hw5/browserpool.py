@@ -0,0 +1,133 @@
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError
+from playwright.sync_api import sync_playwright
+from lib.browserProfile import launch_chromium, block_page_requests, playwright_browser_pids, report_playwright_usage
+
+class BrowserPool:
+    """
+    A pool of long-lived Chromium browsers for the Flask app.
+
+    Playwright's sync API objects can only be used from the thread that created
+    them, so each browser is owned by a dedicated slot thread. Callers submit a
+    function that receives a fresh, isolated BrowserContext; the slot runs it,
+    closes the context and hands back the result. The number of slots caps the
+    number of concurrent contexts, and each browser is health-checked before use
+    and recycled after `max_uses` jobs. Each slot remembers its browser's
+    process id, so resource usage can be reported per browser.
+    """
+
+    def __init__(self, size=2, max_uses=50):
+        self.size = size
+        self.max_uses = max_uses
+        self.jobs = queue.Queue()
+        self.closed = False
+        self.launches = 0
+        self.completed = 0
+        self.lock = threading.Lock()
+        # Launches are serialized so the browser process that appears can be attributed to its slot
+        self.launch_lock = threading.Lock()
+        self.browser_pids = {}
+        self.threads = [
+            threading.Thread(target=self._slot, name=f"browser-slot-{i}", daemon=True)
+            for i in range(size)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, fn):
+        """Queues fn(context) and returns a Future with its result."""
+        if self.closed:
+            raise RuntimeError("Browser pool is closed.")
+        future = Future()
+        self.jobs.put((fn, future))
+        return future
+
+    def run(self, fn, timeout=None):
+        """
+        Runs fn(context) on a pooled browser and waits up to `timeout` seconds for the result.
+        On timeout the job is cancelled if it has not started yet, and TimeoutError is raised.
+        """
+        future = self.submit(fn)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def close(self):
+        self.closed = True
+        for _ in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join(timeout=10)
+
+    def stats(self):
+        with self.lock:
+            return {"size": self.size, "launches": self.launches, "completed": self.completed, "queued": self.jobs.qsize()}
+
+    def report_usage(self):
+        """Prints memory / CPU of each slot's browser process tree."""
+        with self.lock:
+            browser_pids = dict(self.browser_pids)
+        for slot, pid in sorted(browser_pids.items()):
+            report_playwright_usage([pid], label=slot)
+
+    def _launch(self, p):
+        with self.lock:
+            self.launches += 1
+        slot = threading.current_thread().name
+        print(f"[{slot}] Launching browser.")
+        with self.launch_lock:
+            before = playwright_browser_pids()
+            browser = launch_chromium(p)
+            new_pids = playwright_browser_pids() - before
+        with self.lock:
+            if len(new_pids) == 1:
+                self.browser_pids[slot] = new_pids.pop()
+            else:
+                self.browser_pids.pop(slot, None)
+        return browser
+
+    def _slot(self):
+        with sync_playwright() as p:
+            browser = None
+            uses = 0
+            while True:
+                job = self.jobs.get()
+                if job is None:
+                    break
+                fn, future = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                context = None
+                result = error = None
+                try:
+                    # Health check: relaunch if the browser died or has served enough jobs
+                    if browser is None or not browser.is_connected() or uses >= self.max_uses:
+                        if browser is not None and browser.is_connected():
+                            browser.close()
+                        browser = self._launch(p)
+                        uses = 0
+                    context = browser.new_context()
+                    block_page_requests(context)
+                    result = fn(context)
+                except Exception as e:
+                    error = e
+                finally:
+                    # A failing close must not kill the slot thread, or queued futures would never resolve
+                    if context is not None:
+                        try:
+                            context.close()
+                        except Exception as e:
+                            print(f"[{threading.current_thread().name}] Failed to close context: {e}")
+                    uses += 1
+                    with self.lock:
+                        self.completed += 1
+                if not future.done():
+                    if error is None:
+                        future.set_result(result)
+                    else:
+                        future.set_exception(error)
+            if browser is not None and browser.is_connected():
+                browser.close()
@@ -0,0 +1,99 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+class Job:
+    """State of one background job; every update goes through the queue's lock."""
+
+    def __init__(self, kind, lock):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued" # queued -> running -> done / error
+        self.message = ""
+        self.result = None
+        self.total_blocks = 0
+        self.blocks = {}
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = lock
+
+    def block_update(self, block_number, total_blocks, status, seconds=None):
+        """Progress callback: records the outcome of one analysis block."""
+        with self._lock:
+            self.total_blocks = total_blocks
+            self.blocks[block_number] = {"block": block_number, "status": status, "seconds": seconds}
+
+    def set_message(self, message):
+        with self._lock:
+            self.message = message
+
+    def to_dict(self):
+        with self._lock:
+            done = sum(1 for block in self.blocks.values() if block["status"] != "running")
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "message": self.message,
+                "progress": {
+                    "done_blocks": done,
+                    "total_blocks": self.total_blocks,
+                    "blocks": [self.blocks[n] for n in sorted(self.blocks)],
+                },
+                "result": self.result,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+class JobQueue:
+    """
+    Runs scrape/report work on a local thread pool so HTTP requests return immediately.
+    Only the most recent `keep` jobs are remembered.
+    """
+
+    def __init__(self, workers=1, keep=100):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self.jobs = OrderedDict()
+        self.keep = keep
+        self.lock = threading.Lock()
+
+    def submit(self, kind, fn, *args):
+        """Queues fn(job, *args); its return value becomes job.result. Returns the job id."""
+        job = Job(kind, self.lock)
+        with self.lock:
+            self.jobs[job.id] = job
+            self._evict()
+        self.executor.submit(self._run, job, fn, args)
+        return job.id
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _evict(self):
+        # Drop the oldest finished jobs once we remember more than `keep`
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in ("done", "error")]
+        for job_id in finished[:max(0, len(self.jobs) - self.keep)]:
+            del self.jobs[job_id]
+
+    def _run(self, job, fn, args):
+        with self.lock:
+            job.status = "running"
+            job.started_at = time.time()
+        try:
+            result = fn(job, *args)
+            with self.lock:
+                job.result = result
+                job.status = "done"
+        except Exception as e:
+            print(f"Job {job.id} ({job.kind}) failed: {e}")
+            with self.lock:
+                job.message = str(e)
+                job.status = "error"
+        finally:
+            with self.lock:
+                job.finished_at = time.time()
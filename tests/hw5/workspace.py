@@ -0,0 +1,84 @@
+import os
+import re
+import time
+import shutil
+
+PRODUCT_CODE_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,32}$")
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+REPORT_NAME = "report.pdf"
+
+class Workspace:
+    """
+    Files for one job (CSV, intermediate HTML, PDF report), under <root>/<product code>/<job id>/.
+    The latest successfully scraped CSV of a product is published to <root>/<product code>/list.csv.
+    """
+
+    def __init__(self, root, code, job_id):
+        self.code = code
+        self.job_id = job_id
+        self.product_dir = os.path.join(root, code)
+        self.path = os.path.join(self.product_dir, job_id)
+        os.makedirs(self.path, exist_ok=True)
+
+    @property
+    def csv_file(self):
+        return os.path.join(self.path, "list.csv")
+
+    @property
+    def html_file(self):
+        return os.path.join(self.path, "output.html")
+
+    @property
+    def pdf_file(self):
+        return os.path.join(self.path, REPORT_NAME)
+
+    @property
+    def published_csv(self):
+        return os.path.join(self.product_dir, "list.csv")
+
+    def publish_csv(self):
+        """Atomically makes this job's CSV the product's current review set."""
+        tmp_file = os.path.join(self.product_dir, f".list.{self.job_id}.csv")
+        shutil.copyfile(self.csv_file, tmp_file)
+        os.replace(tmp_file, self.published_csv)
+
+def is_valid_code(code):
+    """Product codes become directory names, so only allow plain identifiers."""
+    return bool(code and PRODUCT_CODE_PATTERN.match(code))
+
+def is_valid_job_id(job_id):
+    return bool(job_id and JOB_ID_PATTERN.match(job_id))
+
+def product_csv(root, code):
+    return os.path.join(root, code, "list.csv")
+
+def report_pdf(root, code, job_id):
+    """Path of a finished job's PDF report; it is removed together with the job's workspace."""
+    return os.path.join(root, code, job_id, REPORT_NAME)
+
+def cleanup_workspaces(root, ttl_seconds, max_products, keep=(), keep_products=()):
+    """
+    Deletes job workspaces older than `ttl_seconds`, then whole products beyond the
+    `max_products` most recently used. Directories in `keep` (active jobs) are never removed,
+    and neither are products in `keep_products` (codes with queued or running jobs).
+    """
+    if not os.path.isdir(root):
+        return
+    now = time.time()
+    keep = {os.path.abspath(path) for path in keep}
+    products = []
+    for code in os.listdir(root):
+        product_dir = os.path.join(root, code)
+        if not os.path.isdir(product_dir):
+            continue
+        for job_id in os.listdir(product_dir):
+            job_dir = os.path.join(product_dir, job_id)
+            if os.path.isdir(job_dir) and os.path.abspath(job_dir) not in keep and now - os.path.getmtime(job_dir) > ttl_seconds:
+                shutil.rmtree(job_dir, ignore_errors=True)
+        products.append((os.path.getmtime(product_dir), code, product_dir))
+
+    products.sort(reverse=True)
+    for _, code, product_dir in products[max_products:]:
+        if code in keep_products or any(path.startswith(os.path.abspath(product_dir) + os.sep) for path in keep):
+            continue
+        shutil.rmtree(product_dir, ignore_errors=True)
@@ -0,0 +1,24 @@
+import os
+import sys
+import pytest
+
+# lib.getRanking 匯入時需要 selenium、requests 與 python-dotenv
+for module in ("selenium", "requests", "dotenv"):
+  pytest.importorskip(module)
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from lib.fetchRanking import parse_ranking_html
+from lib.getRanking import parse_ranking_info
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "sensortower_overview.html")
+
+def test_overview_page_ranking_parses_offline():
+  with open(FIXTURE, encoding="utf-8") as f:
+    html = f.read()
+  rank = parse_ranking_info(parse_ranking_html(html))
+  assert rank['rank'] == 12
+  assert rank['category'] == "Education"
+  assert rank['metric'] == "Top Free"
+
+def test_page_without_ranking_block_returns_none():
+  assert parse_ranking_html("<html><body><span>#1</span></body></html>") is None
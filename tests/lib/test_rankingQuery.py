@@ -0,0 +1,37 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from lib.rankingStore import open_store, save_rankings
+from lib.rankingQuery import load_history, summary_records
+
+def make_store(path, days):
+  conn = open_store(path)
+  try:
+    for date, rankings in days.items():
+      save_rankings(conn, date, rankings)
+  finally:
+    conn.close()
+
+def test_all_na_store_summarizes_without_dates(tmp_path):
+  path = str(tmp_path / "rankings.db")
+  make_store(path, {"2025-01-01": {"cyou.sk5s.app.answersai_TW_android": {"rank": "NA", "category": "NA"}}})
+  records = summary_records(load_history(path))
+  assert len(records) == 1
+  assert records[0]['key'] == "cyou.sk5s.app.answersai_TW_android"
+  assert records[0]['latest_rank'] is None
+  assert records[0]['best_date'] is None
+  assert records[0]['worst_date'] is None
+
+def test_best_and_worst_dates_are_strings(tmp_path):
+  path = str(tmp_path / "rankings.db")
+  key = "cyou.sk5s.app.answersai_TW_android"
+  make_store(path, {
+    "2025-01-01": {key: {"rank": 12, "category": "Education"}},
+    "2025-01-02": {key: {"rank": 8, "category": "Education"}},
+    "2025-01-03": {key: {"rank": "NA", "category": "NA"}},
+  })
+  records = summary_records(load_history(path))
+  assert records[0]['best_rank'] == 8
+  assert records[0]['best_date'] == "2025-01-02"
+  assert records[0]['worst_date'] == "2025-01-01"
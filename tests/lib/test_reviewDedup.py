@@ -0,0 +1,35 @@
+import os
+import sys
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from lib.reviewDedup import cluster_texts, dedup_reviews, COUNT_COLUMN, RATINGS_COLUMN
+
+def test_short_reviews_with_different_wording_stay_separate():
+  texts = ["很好用", "不好用", "好用 推", "很難用", "不推薦", "很推薦"]
+  _, clusters = cluster_texts(texts, threshold=0.7)
+  assert clusters == [0, 1, 2, 3, 4, 5]
+
+def test_exact_duplicates_after_normalization_merge():
+  _, clusters = cluster_texts(["很好用", "很好用！", " 很 好用"], threshold=0.7)
+  assert clusters == [0, 0, 0]
+
+def test_long_near_duplicates_merge_unless_polarity_differs():
+  texts = [
+    "包裝完整，出貨速度很快，東西很好用",
+    "包裝完整 出貨速度很快 東西很好用推",
+    "包裝完整，出貨速度很快，東西不好用"
+  ]
+  _, clusters = cluster_texts(texts, threshold=0.7)
+  assert clusters == [0, 0, 1]
+
+def test_dedup_keeps_ratings_of_merged_reviews():
+  df = pd.DataFrame({
+    "使用者": ["a", "b", "c", "d"],
+    "評分": [5, 4, 5, 1],
+    "留言內容": ["很好用", "很好用！", "很好用", "不好用"]
+  })
+  deduped = dedup_reviews(df, threshold=0.7)
+  assert deduped["使用者"].tolist() == ["a", "d"]
+  assert deduped[COUNT_COLUMN].tolist() == [3, 1]
+  assert deduped[RATINGS_COLUMN].tolist() == ["5×2、4×1", "1×1"]